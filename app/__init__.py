@@ -6,6 +6,14 @@ def create_app(config_class=Config):
     
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # Validated here rather than at import, so tests and tooling can import config freely
+    if not app.config.get('TESTING'):
+        config_class.validate_config()
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        app.config['MAX_CONTENT_LENGTH'] = app.config.get('MAX_UPLOAD_SIZE')
+    
+    # Services are created lazily on first request (see routes.get_validation_service)
+    app.extensions['validation_service'] = None
     
     # Register blueprints
     from app.routes import bp
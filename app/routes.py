@@ -1,42 +1,134 @@
-from flask import Blueprint, request, jsonify, render_template, current_app
-from .services.validation_service import ValidationService
+from flask import Blueprint, request, jsonify, render_template, send_file, current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from .services.validation_service import ValidationService, is_allowed_content_type
 import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from typing import Optional
 
 bp = Blueprint('main', __name__)
-validation_service = ValidationService()
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+ALLOWED_UPLOAD_MIMETYPES = ('multipart/form-data', 'application/octet-stream')
+FAVICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'favicon.ico')
+FAVICON_MAX_AGE = 86400  # 1 day
+
+_validation_service_lock = threading.Lock()
+
+def get_validation_service() -> ValidationService:
+    """Return the app's ValidationService, creating it on first use"""
+    service = current_app.extensions.get('validation_service')
+    if service is None:
+        with _validation_service_lock:
+            service = current_app.extensions.get('validation_service')
+            if service is None:
+                service = ValidationService(current_app.config.get('MAX_CONTENT_LENGTH'))
+                current_app.extensions['validation_service'] = service
+    return service
+
+def _reject_upload_early():
+    """Reject oversized or unsupported uploads from the request headers, before reading the body"""
+    max_length = current_app.config.get('MAX_CONTENT_LENGTH')
+    if max_length and request.content_length and request.content_length > max_length:
+        return jsonify({'error': 'File too large'}), 413
+
+    if request.content_length and request.mimetype not in ALLOWED_UPLOAD_MIMETYPES:
+        return jsonify({'error': 'Unsupported upload format'}), 415
+
+    return None
+
+def _raw_upload_headers():
+    """Return (filename, content_type) announced for a raw body upload"""
+    filename = request.headers.get('X-Content-Name', '')
+    content_type = (request.headers.get('X-Content-Type')
+                    or mimetypes.guess_type(filename)[0]
+                    or '')
+    return filename, content_type
+
+def _spool_raw_upload(filename: str, content_type: str) -> Optional[FileStorage]:
+    """Stream a raw request body to a temporary file without buffering it in memory
+    
+    Returns None when the body is empty.
+    """
+    tmp = tempfile.TemporaryFile()
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            tmp.write(chunk)
+    except BaseException:
+        tmp.close()
+        raise
+    if not tmp.tell():
+        tmp.close()
+        return None
+    tmp.seek(0)
+
+    return FileStorage(stream=tmp, filename=filename, content_type=content_type)
+
 @bp.route('/')
 def index():
     return render_template('index.html')
 
 @bp.route('/api/validate', methods=['POST'])
 def validate_ticket():
+    file = None
     try:
-        if 'ticket_image' not in request.files:
+        rejection = _reject_upload_early()
+        if rejection:
+            return rejection
+
+        if request.mimetype == 'application/octet-stream':
+            # Raw body upload: check the announced type, then bypass multipart parsing entirely
+            filename, content_type = _raw_upload_headers()
+            if not filename:
+                return jsonify({'error': 'Invalid filename'}), 400
+            if not is_allowed_content_type(content_type):
+                return jsonify({'error': 'Unsupported file type'}), 415
+            file = _spool_raw_upload(filename, content_type)
+            if file is None:
+                return jsonify({'error': 'No file provided'}), 400
+        elif 'ticket_image' in request.files:
+            file = request.files['ticket_image']
+        else:
             return jsonify({'error': 'No file provided'}), 400
 
-        file = request.files['ticket_image']
         if not file.filename:
             return jsonify({'error': 'Invalid filename'}), 400
 
         # Check file type
-        if not file.content_type.startswith(('image/', 'application/pdf')):
+        if not is_allowed_content_type(file.content_type):
             return jsonify({'error': 'Unsupported file type'}), 400
 
         # Process the file with validation service
-        validation_result = validation_service.validate_ticket(file)
+        validation_result = get_validation_service().validate_ticket(file)
         
         return jsonify(validation_result)
 
+    except RequestEntityTooLarge:
+        # Raised while reading a body sent without Content-Length
+        return jsonify({'error': 'File too large'}), 413
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error(f"Error during validation: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+    finally:
+        if file is not None:
+            file.close()
+
 @bp.route('/api/clear-cache', methods=['POST'])
 def clear_cache():
     try:
-        validation_service.clear_cache()
+        get_validation_service().clear_cache()
         return jsonify({'message': 'Cache cleared successfully'})
     except Exception as e:
         logger.error(f"Error clearing cache: {str(e)}")
@@ -44,4 +136,6 @@ def clear_cache():
 
 @bp.route('/favicon.ico')
 def favicon():
-    return current_app.send_from_directory('static', 'favicon.ico')
+    # conditional=True enables ETag/304 handling and lets the WSGI server use sendfile
+    return send_file(FAVICON_PATH, mimetype='image/x-icon',
+                     conditional=True, max_age=FAVICON_MAX_AGE)
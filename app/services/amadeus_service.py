@@ -1,42 +1,136 @@
-from amadeus import Client, ResponseError
+from amadeus import Client, ClientError, NotFoundError, ResponseError
+import copy
 import os
 import logging
 from datetime import datetime
 import json
 from typing import Dict, Optional, List
-import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.error import URLError
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .cache_service import CacheService, cached
 
 logger = logging.getLogger(__name__)
 
+# Client errors describing the request itself; 429 (quota exceeded) is a ClientError too but transient
+CACHEABLE_CLIENT_STATUS = {400, 404}
+
+# Bounded pool shared by batch validations, sized to stay within the Amadeus quota
+AMADEUS_MAX_CONCURRENCY = int(os.getenv('AMADEUS_MAX_CONCURRENCY', '4'))
+_executor = ThreadPoolExecutor(max_workers=AMADEUS_MAX_CONCURRENCY, thread_name_prefix='amadeus')
+
+AMADEUS_POOL_SIZE = 20
+AMADEUS_HTTP_TIMEOUT = 30  # seconds
+
+class _SessionResponse:
+    """Expose a requests.Response through the urlopen response interface used by the Amadeus SDK"""
+
+    def __init__(self, response: requests.Response):
+        self._response = response
+        self.status = response.status_code
+
+    def getheaders(self):
+        return list(self._response.headers.items())
+
+    def info(self):
+        return self._response.headers
+
+    def read(self) -> bytes:
+        return self._response.content
+
+class _SessionHTTP:
+    """urlopen-compatible callable reusing pooled keep-alive connections"""
+
+    def __init__(self, pool_size: int = AMADEUS_POOL_SIZE):
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __call__(self, http_request):
+        try:
+            response = self.session.request(
+                http_request.get_method(),
+                http_request.full_url,
+                headers=dict(http_request.header_items()),
+                data=http_request.data,
+                timeout=AMADEUS_HTTP_TIMEOUT
+            )
+        except requests.RequestException as e:
+            # The SDK turns URLError into a NetworkError response
+            raise URLError(e)
+        return _SessionResponse(response)
+
 class AmadeusService:
+    # In-flight lookups shared by all instances, like the cache they fill
+    _inflight: Dict[tuple, Future] = {}
+    _inflight_lock = threading.Lock()
+    inflight_timeout = 30  # seconds to wait for a concurrent lookup
+
+    # Amadeus clients shared by all instances using the same credentials
+    _clients: Dict[tuple, Client] = {}
+    _clients_lock = threading.Lock()
+
     def __init__(self):
-        self.client = Client(
-            client_id=os.getenv('AMADEUS_CLIENT_ID'),
-            client_secret=os.getenv('AMADEUS_CLIENT_SECRET')
-        )
-        self.cache = {}
+        self._credentials = (os.getenv('AMADEUS_CLIENT_ID'), os.getenv('AMADEUS_CLIENT_SECRET'))
+        self._client = None
+        self._cache = CacheService()
         self.cache_duration = 3600  # 1 hour cache
+        self.negative_cache_duration = 300  # 5 minutes for failed lookups
 
-    def _get_cache_key(self, flight_number: str, departure_date: str) -> str:
-        """Generate cache key for flight validation"""
-        return f"{flight_number}_{departure_date}"
+    @property
+    def is_configured(self) -> bool:
+        """Whether Amadeus credentials are available"""
+        return all(self._credentials)
 
-    def _get_from_cache(self, cache_key: str) -> Optional[Dict]:
-        """Get cached flight validation result if not expired"""
-        if cache_key in self.cache:
-            result, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_duration:
-                return result
-            del self.cache[cache_key]
-        return None
+    @property
+    def client(self) -> Client:
+        """Amadeus client, created on first use and shared across instances"""
+        if self._client is None:
+            with self._clients_lock:
+                client = self._clients.get(self._credentials)
+                if client is None:
+                    client_id, client_secret = self._credentials
+                    client = Client(
+                        client_id=client_id,
+                        client_secret=client_secret,
+                        http=_SessionHTTP()
+                    )
+                    self._clients[self._credentials] = client
+            self._client = client
+        return self._client
 
-    def _save_to_cache(self, cache_key: str, result: Dict):
-        """Save flight validation result to cache"""
-        self.cache[cache_key] = (result, time.time())
+    @staticmethod
+    def _flight_key(flight_info: Dict) -> tuple:
+        """Identity of a flight lookup: the verdict depends on the flight, date and route"""
+        return (
+            flight_info.get('flight_number'),
+            flight_info.get('departure_date'),
+            (flight_info.get('departure') or {}).get('iata_code'),
+            (flight_info.get('arrival') or {}).get('iata_code')
+        )
+
+    @staticmethod
+    def _is_definitive_miss(error: ResponseError) -> bool:
+        """Whether an Amadeus error will recur on retry; server, network and quota failures are transient"""
+        if isinstance(error, NotFoundError):
+            return True
+        return (isinstance(error, ClientError)
+                and getattr(error.response, 'status_code', None) in CACHEABLE_CLIENT_STATUS)
 
     def clear_cache(self):
         """Clear all cached flight validation results"""
-        self.cache = {}
+        self._cache.clear("amadeus_flight")
         logger.info("Amadeus service cache cleared")
 
     def validate_flight(self, flight_info: Dict) -> Dict:
@@ -53,107 +147,52 @@ class AmadeusService:
         Returns:
             Dict containing validation results and additional flight information
         """
+        if not self.is_configured:
+            logger.warning("Amadeus credentials missing, skipping flight validation")
+            return {
+                "is_valid": False,
+                "errors": ["Service Amadeus non configuré"],
+                "details": None
+            }
+
         try:
-            # Check cache first
-            cache_key = self._get_cache_key(flight_info['flight_number'], flight_info['departure_date'])
-            cached_result = self._get_from_cache(cache_key)
+            # Check cache first; the verdict depends on the route, not only the flight and date
+            cache_key = self._cache.cache_key(
+                "amadeus_flight",
+                flight_info['flight_number'],
+                flight_info['departure_date'],
+                flight_info['departure']['iata_code'],
+                flight_info['arrival']['iata_code']
+            )
+            cached_result = self._cache.get(cache_key)
             if cached_result:
-                logger.info(f"Using cached validation for flight {flight_info['flight_number']}")
+                logger.info("Using cached validation for flight %s", flight_info['flight_number'])
                 return cached_result
 
-            # Extract carrier code and flight number
-            carrier_code = flight_info['flight_number'][:2]
-            flight_number = flight_info['flight_number'][2:]
-            departure_date = flight_info['departure_date']
+            # Coalesce concurrent lookups for the same flight and route (singleflight)
+            flight_key = self._flight_key(flight_info)
+            with self._inflight_lock:
+                future = self._inflight.get(flight_key)
+                is_owner = future is None
+                if is_owner:
+                    future = Future()
+                    self._inflight[flight_key] = future
 
-            try:
-                response = self.client.schedule.flights.get(
-                    carrierCode=carrier_code,
-                    flightNumber=flight_number,
-                    scheduledDepartureDate=departure_date
-                )
-                
-                flight_schedules = response.data
-                
-                if not flight_schedules:
-                    return {
-                        "is_valid": False,
-                        "errors": ["Vol non trouvé dans la base Amadeus"],
-                        "details": None
-                    }
-                
-                # Find matching flight
-                matching_flight = None
-                for schedule in flight_schedules:
-                    if (schedule['flightDesignator']['carrierCode'] == carrier_code and
-                        schedule['flightDesignator']['flightNumber'] == flight_number and
-                        schedule['flightPoints'][0]['iataCode'] == flight_info['departure']['iata_code'] and
-                        schedule['flightPoints'][-1]['iataCode'] == flight_info['arrival']['iata_code']):
-                        matching_flight = schedule
-                        break
-                
-                if not matching_flight:
-                    return {
-                        "is_valid": False,
-                        "errors": ["Les informations de vol ne correspondent pas aux données Amadeus"],
-                        "details": None
-                    }
-                
-                # Extract only the information provided by Amadeus
-                flight_details = {
-                    "carrier": {
-                        "code": matching_flight['flightDesignator']['carrierCode']
-                    },
-                    "flight_number": matching_flight['flightDesignator']['flightNumber'],
-                    "departure": {
-                        "iata_code": matching_flight['flightPoints'][0]['iataCode']
-                    },
-                    "arrival": {
-                        "iata_code": matching_flight['flightPoints'][-1]['iataCode']
-                    }
-                }
+            if not is_owner:
+                # Share the owner's outcome, result or exception, instead of repeating the call
+                return copy.deepcopy(future.result(timeout=self.inflight_timeout))
 
-                # Add optional fields only if they exist in the Amadeus response
-                if 'carrierName' in matching_flight:
-                    flight_details['carrier']['name'] = matching_flight['carrierName']
-                
-                if 'terminal' in matching_flight['flightPoints'][0]:
-                    flight_details['departure']['terminal'] = matching_flight['flightPoints'][0]['terminal'].get('code')
-                
-                if 'scheduledTime' in matching_flight['flightPoints'][0]:
-                    flight_details['departure']['scheduled_time'] = matching_flight['flightPoints'][0]['scheduledTime']
-                
-                if 'terminal' in matching_flight['flightPoints'][-1]:
-                    flight_details['arrival']['terminal'] = matching_flight['flightPoints'][-1]['terminal'].get('code')
-                
-                if 'scheduledTime' in matching_flight['flightPoints'][-1]:
-                    flight_details['arrival']['scheduled_time'] = matching_flight['flightPoints'][-1]['scheduledTime']
-                
-                if 'aircraftEquipment' in matching_flight and 'aircraftType' in matching_flight['aircraftEquipment']:
-                    flight_details['aircraft'] = matching_flight['aircraftEquipment']['aircraftType']
-                
-                if 'status' in matching_flight:
-                    flight_details['status'] = matching_flight['status']
-                
-                validation_result = {
-                    "is_valid": True,
-                    "errors": [],
-                    "details": flight_details
-                }
-                
-                # Cache the result
-                self._save_to_cache(cache_key, validation_result)
-                
-                return validation_result
+            try:
+                result = self._fetch_flight_validation(flight_info, cache_key)
+                future.set_result(result)
+                return result
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(flight_key, None)
 
-            except ResponseError as error:
-                logger.error(f"Amadeus API error: {error}")
-                return {
-                    "is_valid": False,
-                    "errors": ["Erreur lors de la vérification du vol"],
-                    "details": None
-                }
-                
         except Exception as e:
             logger.error(f"Flight validation error: {str(e)}")
             return {
@@ -162,6 +201,153 @@ class AmadeusService:
                 "details": None
             }
 
+    def _fetch_flight_validation(self, flight_info: Dict, cache_key: str) -> Dict:
+        """Query Amadeus for a flight and cache the validation result"""
+        # Extract carrier code and flight number
+        full_flight_number = flight_info['flight_number']
+        carrier_code, flight_number = full_flight_number[:2], full_flight_number[2:]
+        departure_date = flight_info['departure_date']
+        target_designator = (carrier_code, flight_number)
+        target_route = (flight_info['departure']['iata_code'], flight_info['arrival']['iata_code'])
+
+        try:
+            response = self.client.schedule.flights.get(
+                carrierCode=carrier_code,
+                flightNumber=flight_number,
+                scheduledDepartureDate=departure_date
+            )
+            
+            flight_schedules = response.data
+            
+            if not flight_schedules:
+                result = {
+                    "is_valid": False,
+                    "errors": ["Vol non trouvé dans la base Amadeus"],
+                    "details": None
+                }
+                self._cache.set(cache_key, result, self.negative_cache_duration)
+                return result
+            
+            # Index schedules by route, keeping the first match per (origin, destination)
+            by_route = {}
+            for schedule in reversed(flight_schedules):
+                designator = schedule['flightDesignator']
+                if (designator['carrierCode'], designator['flightNumber']) == target_designator:
+                    points = schedule['flightPoints']
+                    by_route[(points[0]['iataCode'], points[-1]['iataCode'])] = schedule
+            matching_flight = by_route.get(target_route)
+            
+            if not matching_flight:
+                result = {
+                    "is_valid": False,
+                    "errors": ["Les informations de vol ne correspondent pas aux données Amadeus"],
+                    "details": None
+                }
+                self._cache.set(cache_key, result, self.negative_cache_duration)
+                return result
+            
+            designator = matching_flight['flightDesignator']
+            origin = matching_flight['flightPoints'][0]
+            destination = matching_flight['flightPoints'][-1]
+
+            # Extract only the information provided by Amadeus
+            flight_details = {
+                "carrier": {
+                    "code": designator['carrierCode']
+                },
+                "flight_number": designator['flightNumber'],
+                "departure": {
+                    "iata_code": origin['iataCode']
+                },
+                "arrival": {
+                    "iata_code": destination['iataCode']
+                }
+            }
+
+            # Add optional fields only if they exist in the Amadeus response
+            if 'carrierName' in matching_flight:
+                flight_details['carrier']['name'] = matching_flight['carrierName']
+            
+            if 'terminal' in origin:
+                flight_details['departure']['terminal'] = origin['terminal'].get('code')
+            
+            if 'scheduledTime' in origin:
+                flight_details['departure']['scheduled_time'] = origin['scheduledTime']
+            
+            if 'terminal' in destination:
+                flight_details['arrival']['terminal'] = destination['terminal'].get('code')
+            
+            if 'scheduledTime' in destination:
+                flight_details['arrival']['scheduled_time'] = destination['scheduledTime']
+            
+            if 'aircraftEquipment' in matching_flight and 'aircraftType' in matching_flight['aircraftEquipment']:
+                flight_details['aircraft'] = matching_flight['aircraftEquipment']['aircraftType']
+            
+            if 'status' in matching_flight:
+                flight_details['status'] = matching_flight['status']
+            
+            validation_result = {
+                "is_valid": True,
+                "errors": [],
+                "details": flight_details
+            }
+            
+            # Cache the result
+            self._cache.set(cache_key, validation_result, self.cache_duration)
+            
+            return validation_result
+
+        except ResponseError as error:
+            logger.error(f"Amadeus API error: {error}")
+            result = {
+                "is_valid": False,
+                "errors": ["Erreur lors de la vérification du vol"],
+                "details": None
+            }
+            if self._is_definitive_miss(error):
+                self._cache.set(cache_key, result, self.negative_cache_duration)
+            return result
+
+    def validate_flights(self, flight_infos: List[Dict]) -> List[Dict]:
+        """
+        Validate several flights, issuing one Amadeus call per distinct flight
+        
+        Identical flights are coalesced and distinct ones are validated
+        concurrently on a bounded worker pool.
+        
+        Args:
+            flight_infos: List of dictionaries as accepted by validate_flight
+            
+        Returns:
+            List of validation results, in the same order as flight_infos
+        """
+        futures = {}
+        for flight_info in flight_infos:
+            key = self._flight_key(flight_info)
+            if key not in futures:
+                futures[key] = _executor.submit(self.validate_flight, flight_info)
+
+        return [futures[self._flight_key(flight_info)].result() for flight_info in flight_infos]
+
+    def get_airports_info(self, iata_codes: List[str]) -> List[Optional[Dict]]:
+        """
+        Look up several airports concurrently, e.g. a ticket's departure and arrival
+
+        Args:
+            iata_codes: List of IATA codes (e.g., ["MRS", "CDG"])
+
+        Returns:
+            List of airport details (or None), in the same order as iata_codes
+        """
+        futures = {}
+        for iata_code in iata_codes:
+            if iata_code not in futures:
+                futures[iata_code] = _executor.submit(self.get_airport_info, iata_code)
+
+        return [futures[iata_code].result() for iata_code in iata_codes]
+
+    # IATA codes are case-insensitive: 'cdg' and 'CDG' share one entry, keyed without stringification
+    @cached('amadeus_airport', expire_in_seconds=86400, key_fn=str.upper)
     def get_airport_info(self, iata_code: str) -> Optional[Dict]:
         """
         Get detailed airport information using Amadeus API
@@ -172,6 +358,10 @@ class AmadeusService:
         Returns:
             Dict containing airport details or None if not found
         """
+        if not self.is_configured:
+            logger.warning("Amadeus credentials missing, skipping airport lookup")
+            return None
+
         try:
             response = self.client.reference_data.locations.get(
                 keyword=iata_code,
@@ -1,85 +1,173 @@
+import copy
+import heapq
+import itertools
 import json
 import logging
 import time
 from datetime import timedelta
 from functools import wraps
-from threading import Lock
+from threading import Lock, Thread
 
 class InMemoryCache:
-    def __init__(self):
-        self._cache = {}
-        self._lock = Lock()
+    SHARD_COUNT = 16  # puissance de 2 pour un masquage rapide
+    serialize = False  # stocke des objets Python, sans JSON (CacheService les copie)
+
+    def __init__(self, max_entries=10000, scan_interval=60):
+        """
+        :param max_entries: Nombre maximal d'entrées avant éviction forcée
+        :param scan_interval: Intervalle minimal (secondes) entre deux nettoyages
+        """
+        self._shards = [{} for _ in range(self.SHARD_COUNT)]
+        self._locks = [Lock() for _ in range(self.SHARD_COUNT)]
+        # Tas (expiration, séquence, clé) par segment pour des nettoyages en O(k log N)
+        self._heaps = [[] for _ in range(self.SHARD_COUNT)]
+        self._sequence = itertools.count()
+        self._sweep_lock = Lock()
+        self._last_scan = time.monotonic()
+        self._scan_interval = scan_interval
+        self.max_entries = max_entries
+        self._max_per_shard = max(1, max_entries // self.SHARD_COUNT)
         self.logger = logging.getLogger(__name__)
 
+    def _shard(self, key):
+        """Retourne le verrou, le segment et le tas d'expiration associés à une clé"""
+        index = hash(key) & (self.SHARD_COUNT - 1)
+        return self._locks[index], self._shards[index], self._heaps[index]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
     def get(self, key):
         """Récupère une valeur du cache"""
-        with self._lock:
-            if key in self._cache:
-                value, expiry = self._cache[key]
-                if expiry > time.time():
-                    return value
-                else:
-                    del self._cache[key]
+        lock, shard, _ = self._shard(key)
+        # Lecture sans verrou: dict.get est atomique sous le GIL
+        entry = shard.get(key)
+        if entry is None:
+            return None
+        value, expiry = entry
+        if expiry > time.monotonic():
+            return value
+        # Entrée expirée: suppression sous verrou, sans écraser une réécriture concurrente
+        with lock:
+            if shard.get(key) is entry:
+                del shard[key]
         return None
 
     def set(self, key, value, expire_in_seconds=3600):
         """Stocke une valeur dans le cache avec une durée d'expiration"""
-        with self._lock:
-            expiry = time.time() + expire_in_seconds
-            self._cache[key] = (value, expiry)
-            return True
+        lock, shard, heap = self._shard(key)
+        now = time.monotonic()
+        expiry = now + expire_in_seconds
+        with lock:
+            shard[key] = (value, expiry)
+            heapq.heappush(heap, (expiry, next(self._sequence), key))
+            if len(shard) > self._max_per_shard:
+                self._evict_oldest(shard, heap)
+            elif len(heap) > 2 * len(shard) + 64:
+                self._compact(shard, heap)
+        self._maybe_sweep(now)
+        return True
+
+    @staticmethod
+    def _pop_entry(shard, heap):
+        """Dépile la prochaine entrée valide du tas et la supprime du segment (verrou déjà pris)"""
+        while heap:
+            expiry, _, key = heapq.heappop(heap)
+            entry = shard.get(key)
+            # Les entrées réécrites ou supprimées laissent des éléments périmés dans le tas
+            if entry is not None and entry[1] == expiry:
+                del shard[key]
+                return
+
+    @classmethod
+    def _evict_oldest(cls, shard, heap):
+        """Évince la moitié des entrées ayant l'expiration la plus proche (verrou déjà pris)"""
+        for _ in range(len(shard) // 2):
+            cls._pop_entry(shard, heap)
+
+    def _compact(self, shard, heap):
+        """Reconstruit le tas à partir des seules entrées vivantes (verrou déjà pris)"""
+        heap[:] = [(expiry, next(self._sequence), key) for key, (_, expiry) in shard.items()]
+        heapq.heapify(heap)
+
+    def _maybe_sweep(self, now):
+        """Lance un nettoyage en arrière-plan si l'intervalle est écoulé"""
+        if now - self._last_scan <= self._scan_interval:
+            return
+        # acquire non bloquant: un seul nettoyeur à la fois
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        self._last_scan = now
+        Thread(target=self._sweep, daemon=True).start()
+
+    def _sweep(self):
+        try:
+            self.cleanup()
+        finally:
+            self._sweep_lock.release()
 
     def delete(self, key):
         """Supprime une valeur du cache"""
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+        lock, shard, _ = self._shard(key)
+        with lock:
+            if key in shard:
+                del shard[key]
                 return True
         return False
 
     def cleanup(self):
-        """Nettoie les entrées expirées du cache"""
-        with self._lock:
-            current_time = time.time()
-            expired_keys = [
-                key for key, (_, expiry) in self._cache.items()
-                if expiry <= current_time
-            ]
-            for key in expired_keys:
-                del self._cache[key]
+        """Nettoie les entrées expirées du cache, un segment à la fois"""
+        current_time = time.monotonic()
+        for lock, shard, heap in zip(self._locks, self._shards, self._heaps):
+            with lock:
+                # S'arrête à la première entrée non expirée
+                while heap and heap[0][0] <= current_time:
+                    expiry, _, key = heapq.heappop(heap)
+                    entry = shard.get(key)
+                    if entry is not None and entry[1] == expiry:
+                        del shard[key]
+
+    def clear(self, prefix=None):
+        """Vide le cache, ou seulement les clés commençant par le préfixe"""
+        for lock, shard, heap in zip(self._locks, self._shards, self._heaps):
+            with lock:
+                if prefix is None:
+                    shard.clear()
+                    heap.clear()
+                    continue
+                for key in [k for k in shard if self._key_prefix(k).startswith(prefix)]:
+                    del shard[key]
+
+    @staticmethod
+    def _key_prefix(key):
+        """Clés tuple (préfixe, ...) produites par un key_fn: compare sur le préfixe"""
+        return f"{key[0]}:" if isinstance(key, tuple) else key
 
 class CacheService:
     _instance = None
-    _lock = Lock()
 
     def __new__(cls):
-        """Implémentation Singleton thread-safe"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(CacheService, cls).__new__(cls)
-                    cls._instance._initialized = False
+        """Singleton: l'instance unique est créée à l'import du module, sans verrou ensuite"""
         return cls._instance
 
-    def __init__(self):
+    def _setup(self):
         """Initialise le service de cache"""
-        if not self._initialized:
-            self.cache = InMemoryCache()
-            self.logger = logging.getLogger(__name__)
-            self._initialized = True
+        self.cache = InMemoryCache()
+        self.logger = logging.getLogger(__name__)
 
     def cache_key(self, prefix, *args):
         """Génère une clé de cache unique basée sur les arguments"""
-        return f"{prefix}:{':'.join(str(arg) for arg in args)}"
+        return prefix + ':' + ':'.join(map(str, args))
 
     def get(self, key):
         """Récupère une valeur du cache"""
         try:
             value = self.cache.get(key)
             if value is not None:
-                self.logger.debug(f"Cache hit pour la clé: {key}")
-                return json.loads(value)
-            self.logger.debug(f"Cache miss pour la clé: {key}")
+                self.logger.debug("Cache hit pour la clé: %s", key)
+                # Copie: un appelant qui modifie le résultat ne doit pas altérer l'entrée en cache
+                return json.loads(value) if self.cache.serialize else copy.deepcopy(value)
+            self.logger.debug("Cache miss pour la clé: %s", key)
         except Exception as e:
             self.logger.error(f"Erreur lors de la récupération du cache: {str(e)}")
         return None
@@ -89,11 +177,11 @@ class CacheService:
         try:
             success = self.cache.set(
                 key,
-                json.dumps(value),
+                json.dumps(value) if self.cache.serialize else copy.deepcopy(value),
                 expire_in_seconds
             )
             if success:
-                self.logger.debug(f"Valeur mise en cache pour la clé: {key}")
+                self.logger.debug("Valeur mise en cache pour la clé: %s", key)
             return success
         except Exception as e:
             self.logger.error(f"Erreur lors de la mise en cache: {str(e)}")
@@ -104,27 +192,47 @@ class CacheService:
         try:
             success = self.cache.delete(key)
             if success:
-                self.logger.debug(f"Valeur supprimée du cache pour la clé: {key}")
+                self.logger.debug("Valeur supprimée du cache pour la clé: %s", key)
             return success
         except Exception as e:
             self.logger.error(f"Erreur lors de la suppression du cache: {str(e)}")
             return False
 
-def cached(prefix, expire_in_seconds=3600):
+    def clear(self, prefix=None):
+        """Vide le cache, éventuellement limité à un préfixe de clé"""
+        try:
+            self.cache.clear(f"{prefix}:" if prefix else None)
+            self.logger.debug("Cache vidé (préfixe: %s)", prefix)
+            return True
+        except Exception as e:
+            self.logger.error(f"Erreur lors du vidage du cache: {str(e)}")
+            return False
+
+CacheService._instance = object.__new__(CacheService)
+CacheService._instance._setup()
+cache_service = CacheService._instance
+
+def cached(prefix, expire_in_seconds=3600, key_fn=None):
     """
     Décorateur pour mettre en cache le résultat d'une fonction
     
     :param prefix: Préfixe pour la clé de cache
     :param expire_in_seconds: Durée de validité du cache en secondes
+    :param key_fn: Fonction optionnelle (args -> clé hashable) évitant la conversion en chaîne
     """
+    key_prefix = prefix + ':'
+
     def decorator(func):
+        # Instance du service de cache capturée une fois pour toutes
+        cache = CacheService()
+
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            # Créer une instance du service de cache
-            cache = CacheService()
-            
             # Générer la clé de cache
-            cache_key = cache.cache_key(prefix, *args)
+            if key_fn is not None:
+                cache_key = (prefix, key_fn(*args))
+            else:
+                cache_key = key_prefix + ':'.join(map(str, args))
             
             # Vérifier si le résultat est en cache
             cached_result = cache.get(cache_key)
@@ -1,15 +1,23 @@
 import os
 import anthropic
 import json
-from PIL import Image
+from PIL import Image, ImageOps
 from io import BytesIO
 import hashlib
-import pickle
 import time
+import random
+import re
 import base64
+import copy
 from pathlib import Path
 import logging
 import traceback
+import threading
+import tempfile
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,16 +26,186 @@ logger.setLevel(logging.DEBUG)
 # Create cache directory if it doesn't exist
 CACHE_DIR = Path("cache")
 CACHE_DIR.mkdir(exist_ok=True)
+CACHE_TTL = 24 * 60 * 60  # Cache expires after 24 hours
+# Images Claude could not read are remembered for less time, and only in memory
+NEGATIVE_CACHE_TTL = 60 * 60
+CACHE_ERROR_KEY = '_error'
+
+JPEG_MAGIC = b'\xff\xd8\xff'
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+# Formats sent to Claude in their original encoding when small enough
+PASSTHROUGH_FORMATS = ('JPEG', 'PNG', 'WEBP')
+JPEG_QUALITY = 85
+# Largest JPEG sent as-is: ~5 MB once base64-encoded, Claude's per-image limit
+MAX_PASSTHROUGH_BYTES = 3_750_000
+# Longest edge sent to Claude; larger images cost more tokens without improving extraction
+MAX_IMAGE_EDGE = 1568
+
+# In-process LRU in front of the disk cache: key -> (result, expires_at)
+_MEM_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+_MEM_MAX = 256
+_MEM_LOCK = threading.Lock()
+
+# Disk cache writes are taken off the request path
+_CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ocr-cache')
+
+def _mem_cache_put(cache_key, result, expires_at):
+    """Insert into the in-memory LRU, evicting the least recently used entry"""
+    # Stored as a private copy: the caller keeps using the dict it was given
+    result = copy.deepcopy(result)
+    with _MEM_LOCK:
+        _MEM_CACHE[cache_key] = (result, expires_at)
+        _MEM_CACHE.move_to_end(cache_key)
+        if len(_MEM_CACHE) > _MEM_MAX:
+            _MEM_CACHE.popitem(last=False)
+
+SYSTEM_PROMPT = """You are an expert at extracting flight ticket information.
+Your task is to analyze the provided flight ticket or boarding pass image and extract specific information.
+
+Follow these rules:
+1. Extract information EXACTLY as shown on the ticket
+2. For passenger names, maintain the exact format (e.g., LASTNAME/FIRSTNAME)
+3. For flight numbers, include airline code (e.g., AF123)
+4. For dates, convert to YYYY-MM-DD format
+5. For locations, extract city, country, and IATA code
+6. If you're not certain about information, set it to null
+
+Return the information in this exact JSON format:
+{
+    "passenger_name": "LASTNAME/FIRSTNAME",
+    "flight_number": "XX1234",
+    "departure_date": "YYYY-MM-DD",
+    "departure": {
+        "city": "City name",
+        "country": "Country name",
+        "iata_code": "XXX"
+    },
+    "arrival": {
+        "city": "City name",
+        "country": "Country name",
+        "iata_code": "XXX"
+    },
+    "ticket_number": "12345678"
+}"""
+
+# Ticket fields every extraction must contain; validation_service checks their values
+REQUIRED_FIELDS = ('passenger_name', 'flight_number', 'departure_date', 'departure', 'arrival')
+BATCH_MAX_IMAGES = 5  # images packed into one batched Claude request
+BATCH_TOKENS_PER_IMAGE = 1000
+CLAUDE_MAX_OUTPUT_TOKENS = 4096  # claude-3-opus output limit; larger max_tokens is rejected
+# Markdown code fence Claude sometimes wraps its JSON in
+JSON_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+# Claude API retry policy: honour Retry-After, else exponential backoff with jitter
+CLAUDE_MAX_RETRIES = 3
+CLAUDE_BACKOFF_MAX = 30
+# Rate limit (429) and overload (529) also shrink the concurrency limit
+CLAUDE_OVERLOAD_STATUS = {429, 529}
+# Same transient statuses the SDK retries by default; any 5xx is retried too
+CLAUDE_RETRYABLE_STATUS = {408, 409} | CLAUDE_OVERLOAD_STATUS
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase on success and multiplicative decrease on overload"""
+
+    def __init__(self, initial=4, maximum=16):
+        self._limit = float(initial)
+        self._maximum = maximum
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= max(1, int(self._limit)):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, succeeded=False, overloaded=False):
+        """Release a slot; only successes grow the limit and only overloads shrink it"""
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self._limit = max(1.0, self._limit * 0.5)
+            elif succeeded:
+                self._limit = min(self._maximum, self._limit + 0.5)
+            self._condition.notify_all()
+
+_claude_limiter = AIMDLimiter()
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retrying a throttled or failed Claude call"""
+    response = getattr(error, 'response', None)
+    headers = response.headers if response is not None else {}
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return min(float(retry_after), CLAUDE_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(CLAUDE_BACKOFF_MAX, 2 ** attempt) + random.uniform(0, 0.5)
+
+def call_claude_api(client, **kwargs):
+    """
+    Call Claude's messages API under the shared AIMD concurrency limit
+    
+    Rate-limit (429), overload (529), timeout (408), conflict (409) and
+    server (5xx) errors, connection errors and timeouts are retried after the
+    server-provided Retry-After delay, or an exponential backoff otherwise.
+    """
+    for attempt in range(CLAUDE_MAX_RETRIES + 1):
+        _claude_limiter.acquire()
+        succeeded = overloaded = False
+        try:
+            response = client.messages.create(**kwargs)
+            succeeded = True
+            return response
+        except anthropic.APIStatusError as e:
+            overloaded = e.status_code in CLAUDE_OVERLOAD_STATUS
+            retryable = e.status_code in CLAUDE_RETRYABLE_STATUS or e.status_code >= 500
+            if not retryable or attempt == CLAUDE_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            remaining = e.response.headers.get('anthropic-ratelimit-requests-remaining')
+            logger.warning(
+                f"Claude API error ({e.status_code}), retrying in {delay:.1f}s "
+                f"(requests remaining: {remaining}, concurrency limit: {_claude_limiter.limit})"
+            )
+        except anthropic.APIConnectionError as e:
+            # Also covers APITimeoutError
+            if attempt == CLAUDE_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"Claude API connection error ({e}), retrying in {delay:.1f}s")
+        finally:
+            _claude_limiter.release(succeeded, overloaded)
+        time.sleep(delay)
+
+@functools.lru_cache(maxsize=1)
+def get_claude_client(api_key: str) -> anthropic.Anthropic:
+    """
+    Return a Claude client shared across requests
+    
+    Reusing one client keeps its connection pool alive, so calls skip the
+    TCP and TLS handshake. Retries are handled by call_claude_api.
+    """
+    return anthropic.Anthropic(api_key=api_key, max_retries=0)
 
 def test_claude_api():
-    """Test Claude API configuration and connectivity"""
+    """
+    Test Claude API configuration and connectivity
+    
+    This sends a real request; use it for health checks, not per extraction.
+    """
     api_key = os.getenv('ANTHROPIC_API_KEY')
     if not api_key:
         logger.error("ANTHROPIC_API_KEY not found in environment variables")
         return False, "ANTHROPIC_API_KEY not configured"
         
     try:
-        client = anthropic.Anthropic(api_key=api_key)
+        client = get_claude_client(api_key)
         # Test API with a simple request
         response = client.messages.create(
             model="claude-3-opus-20240229",
@@ -44,12 +222,10 @@ def test_claude_api():
         logger.error(f"Unexpected error testing Claude API: {e}")
         return False, f"Unexpected error: {str(e)}"
 
-def get_cache_key(image):
-    """Generate a cache key from PIL Image"""
+def get_cache_key(image_bytes):
+    """Generate a cache key from the encoded image bytes"""
     try:
-        img_byte_arr = BytesIO()
-        image.save(img_byte_arr, format=image.format or 'PNG')
-        return hashlib.md5(img_byte_arr.getvalue()).hexdigest()
+        return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
     except Exception as e:
         logger.error(f"Error generating cache key: {e}")
         return None
@@ -58,41 +234,77 @@ def get_from_cache(cache_key):
     """Get cached result if it exists and is not expired"""
     if not cache_key:
         return None
+
+    with _MEM_LOCK:
+        entry = _MEM_CACHE.get(cache_key)
+        if entry is not None:
+            if entry[1] > time.time():
+                _MEM_CACHE.move_to_end(cache_key)
+                logger.debug("Memory cache hit")
+                # Copied like CacheService values, so callers cannot alter the cached entry
+                return copy.deepcopy(entry[0])
+            del _MEM_CACHE[cache_key]
         
-    cache_file = CACHE_DIR / f"{cache_key}.pkl"
-    if cache_file.exists():
-        try:
-            with open(cache_file, 'rb') as f:
-                cached_data = pickle.load(f)
-                # Cache expires after 24 hours
-                if time.time() - cached_data['timestamp'] < 24 * 60 * 60:
-                    logger.debug("Cache hit")
-                    return cached_data['result']
-                logger.debug("Cache expired")
-        except Exception as e:
-            logger.warning(f"Cache retrieval error: {e}")
+    cache_file = CACHE_DIR / f"{cache_key}.json"
+    try:
+        # Expiry is checked on the file mtime, without opening the file
+        mtime = cache_file.stat().st_mtime
+        if time.time() - mtime >= CACHE_TTL:
+            logger.debug("Cache expired")
+            return None
+        result = json.loads(cache_file.read_bytes())
+        _mem_cache_put(cache_key, result, mtime + CACHE_TTL)
+        logger.debug("Cache hit")
+        return result
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Cache retrieval error: {e}")
     return None
 
-def save_to_cache(cache_key, result):
-    """Save result to cache"""
-    if not cache_key or not result:
-        return
-        
-    cache_file = CACHE_DIR / f"{cache_key}.pkl"
+def _write_cache_file(cache_file, result):
+    """Atomically write a cache entry to disk"""
+    tmp_name = None
     try:
-        with open(cache_file, 'wb') as f:
-            pickle.dump({
-                'timestamp': time.time(),
-                'result': result
-            }, f)
+        # Serialize before creating the temp file, so a failure leaves nothing behind
+        data = json.dumps(result, separators=(',', ':'))
+        with tempfile.NamedTemporaryFile('w', dir=cache_file.parent, suffix='.tmp',
+                                         encoding='utf-8', delete=False) as tmp:
+            tmp_name = tmp.name
+            tmp.write(data)
+        os.replace(tmp_name, cache_file)
         logger.debug("Saved to cache")
     except Exception as e:
         logger.warning(f"Cache save error: {e}")
+        # clear_cache only removes *.json files: never leave an orphaned temp file
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+
+def save_to_cache(cache_key, result):
+    """Save result to cache; the disk write happens in the background"""
+    if not cache_key or not result:
+        return
+
+    _mem_cache_put(cache_key, result, time.time() + CACHE_TTL)
+    # The target path is resolved now, not when the background write runs
+    _CACHE_EXECUTOR.submit(_write_cache_file, CACHE_DIR / f"{cache_key}.json", result)
+
+def save_failure_to_cache(cache_key, reason):
+    """Remember that an image could not be extracted, so it is not resent to Claude right away"""
+    if not cache_key:
+        return
+
+    _mem_cache_put(cache_key, {CACHE_ERROR_KEY: reason}, time.time() + NEGATIVE_CACHE_TTL)
 
 def clear_cache():
     """Clear all cached OCR results"""
     try:
-        for cache_file in CACHE_DIR.glob("*.pkl"):
+        with _MEM_LOCK:
+            _MEM_CACHE.clear()
+        for cache_file in CACHE_DIR.glob("*.json"):
             cache_file.unlink()
         logger.info("Cache cleared successfully")
         return True
@@ -100,9 +312,57 @@ def clear_cache():
         logger.error(f"Error clearing cache: {e}")
         return False
 
+def image_media_type(image_bytes):
+    """Media type of encoded image bytes Claude accepts as-is, or None"""
+    if image_bytes[:3] == JPEG_MAGIC:
+        return 'image/jpeg'
+    if image_bytes[:8] == PNG_MAGIC:
+        return 'image/png'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def _original_image_bytes(image):
+    """Return the source bytes of an image when they can be sent without re-encoding"""
+    # The file pointer is only kept until the pixel data has been loaded
+    fp = getattr(image, 'fp', None)
+    if image.format not in PASSTHROUGH_FORMATS or fp is None:
+        return None
+    # Claude rejects CMYK and other exotic JPEG modes
+    if image.format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        return None
+    try:
+        position = fp.tell()
+        fp.seek(0)
+        data = fp.read()
+        fp.seek(position)
+    except Exception:
+        return None
+    return data if image_media_type(data) else None
+
 def encode_image_to_base64(image):
-    """Convert PIL Image to base64"""
+    """Encode a PIL Image or image bytes for Claude, returning a (raw_bytes, base64_str) tuple
+    
+    JPEG, PNG and WebP sources are kept in their original encoding when small
+    enough; anything else is converted to JPEG. image_media_type(raw_bytes)
+    gives the media type. raw_bytes may be a memoryview rather than a bytes copy.
+    """
     try:
+        if isinstance(image, (bytes, bytearray)):
+            # Only the header is parsed here; pixels are decoded lazily
+            image = Image.open(BytesIO(image))
+
+        # Reuse the original bytes instead of decoding and re-compressing them
+        if max(image.size) <= MAX_IMAGE_EDGE:
+            raw_image = _original_image_bytes(image)
+            if raw_image and len(raw_image) <= MAX_PASSTHROUGH_BYTES:
+                logger.debug("Image already %s, skipping re-encoding", image.format)
+                return raw_image, base64.b64encode(raw_image).decode('ascii')
+        else:
+            # Downscale to bound upload size and Claude input tokens
+            image = ImageOps.contain(image, (MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+            logger.debug("Image downscaled to %s", image.size)
+
         # Convert RGBA to RGB if needed
         if image.mode == 'RGBA':
             background = Image.new('RGB', image.size, (255, 255, 255))
@@ -114,22 +374,30 @@ def encode_image_to_base64(image):
             image = image.convert('RGB')
             
         # Save as JPEG with good quality
-        img_byte_arr = BytesIO()
-        image.save(img_byte_arr, format='JPEG', quality=95)
-        img_byte_arr = img_byte_arr.getvalue()
-        b64_str = base64.b64encode(img_byte_arr).decode('utf-8')
-        logger.debug(f"Image encoded successfully, size: {len(b64_str)} chars")
-        return b64_str
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+        # getbuffer() is a zero-copy view; base64 is ASCII-only
+        img_byte_arr = buffer.getbuffer()
+        b64_str = base64.b64encode(img_byte_arr).decode('ascii')
+        logger.debug("Image encoded successfully, size: %d chars", len(b64_str))
+        return img_byte_arr, b64_str
     except Exception as e:
         logger.error(f"Error encoding image: {e}")
-        return None
+        return None, None
 
-def extract_ticket_info(image: Image.Image) -> dict:
+def parse_claude_response(text: str):
+    """Parse Claude's JSON reply, tolerating surrounding whitespace and a code fence"""
+    text = text.strip()
+    if text.startswith('`'):
+        text = JSON_FENCE.sub('', text)
+    return json.loads(text)
+
+def extract_ticket_info(image: Union[Image.Image, bytes]) -> dict:
     """
     Extract ticket information from image using Claude AI
     
     Args:
-        image: PIL Image object
+        image: PIL Image object, or raw image bytes
         
     Returns:
         Dictionary containing extracted ticket information
@@ -137,74 +405,41 @@ def extract_ticket_info(image: Image.Image) -> dict:
     try:
         logger.info("Starting ticket information extraction")
         
-        # Test API configuration
-        api_success, api_message = test_claude_api()
-        if not api_success:
-            logger.error(f"Claude API test failed: {api_message}")
+        # Check API configuration (no network round-trip)
+        if not os.getenv('ANTHROPIC_API_KEY'):
+            logger.error("ANTHROPIC_API_KEY not found in environment variables")
+            return None
+            
+        # Encode image once; the raw image bytes also key the cache
+        logger.debug("Converting image to base64")
+        image_bytes, image_b64 = encode_image_to_base64(image)
+        if not image_b64:
+            logger.error("Failed to encode image")
             return None
             
         # Generate cache key from image
         logger.debug("Generating cache key")
-        cache_key = get_cache_key(image)
+        cache_key = get_cache_key(image_bytes)
         
         # Check cache first
         cached_result = get_from_cache(cache_key)
         if cached_result:
+            if CACHE_ERROR_KEY in cached_result:
+                logger.info("Using cached OCR failure: %s", cached_result[CACHE_ERROR_KEY])
+                return None
             logger.info("Using cached OCR result")
             return cached_result
-            
-        # Convert image to base64
-        logger.debug("Converting image to base64")
-        image_b64 = encode_image_to_base64(image)
-        if not image_b64:
-            logger.error("Failed to encode image")
-            return None
         
         # Prepare Claude API request
         logger.debug("Preparing Claude API request")
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        
-        system_prompt = """You are an expert at extracting flight ticket information.
-        Your task is to analyze the provided flight ticket or boarding pass image and extract specific information.
-        
-        Follow these rules:
-        1. Extract information EXACTLY as shown on the ticket
-        2. For passenger names, maintain the exact format (e.g., LASTNAME/FIRSTNAME)
-        3. For flight numbers, include airline code (e.g., AF123)
-        4. For dates, convert to YYYY-MM-DD format
-        5. For locations, extract city, country, and IATA code
-        6. If you're not certain about information, set it to null
-        
-        Return the information in this exact JSON format:
-        {
-            "passenger_name": "LASTNAME/FIRSTNAME",
-            "flight_number": "XX1234",
-            "departure_date": "YYYY-MM-DD",
-            "departure": {
-                "city": "City name",
-                "country": "Country name",
-                "iata_code": "XXX"
-            },
-            "arrival": {
-                "city": "City name",
-                "country": "Country name",
-                "iata_code": "XXX"
-            },
-            "ticket_number": "12345678"
-        }"""
+        # Retries are handled by call_claude_api
+        client = get_claude_client(os.getenv('ANTHROPIC_API_KEY'))
         
         messages = [
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": image_b64
-                        }
-                    },
+                    _image_block(image_b64, image_media_type(image_bytes)),
                     {
                         "type": "text",
                         "text": "Extract the flight ticket information from this image following the exact format specified. If you cannot find certain information, set those fields to null."
@@ -215,29 +450,31 @@ def extract_ticket_info(image: Image.Image) -> dict:
         
         # Call Claude API
         logger.debug("Calling Claude API")
-        response = client.messages.create(
+        response = call_claude_api(
+            client,
             model="claude-3-opus-20240229",
             max_tokens=1000,
             temperature=0,
-            system=system_prompt,
+            system=SYSTEM_PROMPT,
             messages=messages
         )
         
-        logger.debug(f"Claude API response: {response.content[0].text}")
+        logger.debug("Claude API response: %s", response.content[0].text)
         
         # Parse response
         try:
-            result = json.loads(response.content[0].text)
+            result = parse_claude_response(response.content[0].text)
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse Claude API response: {e}")
             logger.error(f"Raw response: {response.content[0].text}")
+            save_failure_to_cache(cache_key, "parse_failed")
             return None
         
         # Validate result structure
-        required_fields = ['passenger_name', 'flight_number', 'departure_date', 'departure', 'arrival']
-        missing_fields = [field for field in required_fields if field not in result]
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in result]
         if missing_fields:
             logger.error(f"Missing required fields in API response: {missing_fields}")
+            save_failure_to_cache(cache_key, "missing_fields")
             return None
             
         # Cache the result
@@ -252,4 +489,107 @@ def extract_ticket_info(image: Image.Image) -> dict:
     except Exception as e:
         logger.error(f"OCR extraction error: {str(e)}")
         logger.error(traceback.format_exc())
-        return None
\ No newline at end of file
+        return None
+
+def _image_block(image_b64, media_type="image/jpeg"):
+    """Claude message content block for a base64 image"""
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": media_type,
+            "data": image_b64
+        }
+    }
+
+def extract_ticket_info_batch(images: List[Union[Image.Image, bytes]]) -> List[Optional[dict]]:
+    """
+    Extract ticket information from several images with batched Claude requests
+    
+    Cached images are served from the cache; the others are sent together,
+    up to BATCH_MAX_IMAGES per request.
+    
+    Args:
+        images: List of PIL Image objects or raw image bytes
+        
+    Returns:
+        List of extracted ticket information dicts (None on failure), in input order
+    """
+    results = [None] * len(images)
+    if not images:
+        return results
+
+    if not os.getenv('ANTHROPIC_API_KEY'):
+        logger.error("ANTHROPIC_API_KEY not found in environment variables")
+        return results
+
+    # Resolve cache hits first; only uncached images go to Claude
+    pending = []
+    for index, image in enumerate(images):
+        image_bytes, image_b64 = encode_image_to_base64(image)
+        if not image_b64:
+            logger.error(f"Failed to encode image {index}")
+            continue
+        cache_key = get_cache_key(image_bytes)
+        cached_result = get_from_cache(cache_key)
+        if cached_result:
+            if CACHE_ERROR_KEY not in cached_result:
+                results[index] = cached_result
+        else:
+            pending.append((index, cache_key, image_b64, image_media_type(image_bytes)))
+
+    if not pending:
+        return results
+
+    client = get_claude_client(os.getenv('ANTHROPIC_API_KEY'))
+
+    for start in range(0, len(pending), BATCH_MAX_IMAGES):
+        batch = pending[start:start + BATCH_MAX_IMAGES]
+        content = []
+        for number, (_, _, image_b64, media_type) in enumerate(batch, 1):
+            content.append({"type": "text", "text": f"Image {number}:"})
+            content.append(_image_block(image_b64, media_type))
+        content.append({
+            "type": "text",
+            "text": (
+                f"Extract the flight ticket information from each of the {len(batch)} images above. "
+                f"Return a JSON array with exactly {len(batch)} objects, in image order, "
+                "each following the exact format specified. If you cannot find certain information, set those fields to null."
+            )
+        })
+
+        try:
+            logger.debug("Calling Claude API for a batch of %d images", len(batch))
+            response = call_claude_api(
+                client,
+                model="claude-3-opus-20240229",
+                max_tokens=min(BATCH_TOKENS_PER_IMAGE * len(batch), CLAUDE_MAX_OUTPUT_TOKENS),
+                temperature=0,
+                system=SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": content}]
+            )
+            batch_results = parse_claude_response(response.content[0].text)
+        except anthropic.APIError as e:
+            logger.error(f"Claude API error: {e}")
+            continue
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Claude API batch response: {e}")
+            continue
+
+        if not isinstance(batch_results, list) or len(batch_results) != len(batch):
+            logger.error(f"Unexpected batch response shape for {len(batch)} images")
+            continue
+
+        for (index, cache_key, _, _), result in zip(batch, batch_results):
+            if not isinstance(result, dict):
+                save_failure_to_cache(cache_key, "parse_failed")
+                continue
+            missing_fields = [field for field in REQUIRED_FIELDS if field not in result]
+            if missing_fields:
+                logger.error(f"Missing required fields in API response for image {index}: {missing_fields}")
+                save_failure_to_cache(cache_key, "missing_fields")
+                continue
+            save_to_cache(cache_key, result)
+            results[index] = result
+
+    return results
@@ -1,9 +1,9 @@
 import logging
-import re
-from datetime import datetime
-from typing import Dict, Optional, Tuple
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
 from .amadeus_service import AmadeusService
-from .ocr_service import extract_ticket_info, clear_cache as clear_ocr_cache
+from .ocr_service import REQUIRED_FIELDS, extract_ticket_info, extract_ticket_info_batch, clear_cache as clear_ocr_cache
 from PIL import Image
 import io
 from werkzeug.datastructures import FileStorage
@@ -12,9 +12,72 @@ from werkzeug.datastructures import FileStorage
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+DATE_LENGTH = len('YYYY-MM-DD')
+DATE_FORMAT_ERROR = "Invalid date format. Expected YYYY-MM-DD"
+MIN_DEPARTURE_DATE = date(2000, 1, 1)  # Basic sanity check
+
+REQUIRED_LOCATION_FIELDS = ('city', 'country', 'iata_code')
+LOCATION_TYPES = ('departure', 'arrival')
+
+IMAGE_CONTENT_PREFIX = 'image/'
+ALLOWED_EXACT_CONTENT_TYPES = frozenset({'application/pdf'})
+
+def is_allowed_content_type(content_type: Optional[str]) -> bool:
+    """Whether an upload's content type is an image or exactly one of the allowed document types"""
+    if not content_type:
+        return False
+    mimetype = content_type.partition(';')[0].strip().lower()
+    return mimetype.startswith(IMAGE_CONTENT_PREFIX) or mimetype in ALLOWED_EXACT_CONTENT_TYPES
+
+# Field formats are checked with str methods: these inputs are too short for a regex to pay off
+def _is_upper_ascii_word(value: str) -> bool:
+    """Whether value is one or more uppercase ASCII letters, like [A-Z]+"""
+    return value.isascii() and value.isalpha() and value.isupper()
+
+def _is_passenger_name(value: str) -> bool:
+    """LASTNAME/FIRSTNAME"""
+    if value.count('/') != 1:
+        return False
+    last_name, first_name = value.split('/')
+    return _is_upper_ascii_word(last_name) and _is_upper_ascii_word(first_name)
+
+def _is_flight_number(value: str) -> bool:
+    """Airline code (2 letters) followed by 1-4 digits"""
+    digits = value[2:]
+    return (3 <= len(value) <= 6 and _is_upper_ascii_word(value[:2])
+            and digits.isascii() and digits.isdigit())
+
+def _is_iata_code(value: str) -> bool:
+    """3 uppercase letters"""
+    return len(value) == 3 and _is_upper_ascii_word(value)
+
+def upload_size(file: FileStorage) -> Optional[int]:
+    """Size of an upload in bytes, from its headers or by seeking its stream, without reading it"""
+    if file.content_length:
+        return file.content_length
+    try:
+        size = file.stream.seek(0, io.SEEK_END)
+        file.stream.seek(0)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+_amadeus_service: Optional[AmadeusService] = None
+_amadeus_service_lock = threading.Lock()
+
+def get_amadeus_service() -> AmadeusService:
+    """Return the AmadeusService shared by all ValidationService instances, creating it on first use"""
+    global _amadeus_service
+    if _amadeus_service is None:
+        with _amadeus_service_lock:
+            if _amadeus_service is None:
+                _amadeus_service = AmadeusService()
+    return _amadeus_service
+
 class ValidationService:
-    def __init__(self):
-        self.amadeus_service = AmadeusService()
+    def __init__(self, max_upload_size: Optional[int] = None):
+        self.amadeus_service = get_amadeus_service()
+        self.max_upload_size = max_upload_size
 
     def validate_ticket(self, file: FileStorage) -> Dict:
         """
@@ -27,7 +90,7 @@ class ValidationService:
             Dict containing validation results and extracted information
         """
         try:
-            logger.info(f"Starting validation for file: {file.filename}")
+            logger.info("Starting validation for file: %s", file.filename)
             
             # Check file content type
             if not file.content_type:
@@ -38,7 +101,7 @@ class ValidationService:
                     "extracted_info": None
                 }
                 
-            if not file.content_type.startswith(('image/', 'application/pdf')):
+            if not is_allowed_content_type(file.content_type):
                 logger.error(f"Invalid content type: {file.content_type}")
                 return {
                     "is_valid": False,
@@ -46,11 +109,22 @@ class ValidationService:
                     "extracted_info": None
                 }
 
-            # Convert FileStorage to PIL Image
+            # Reject oversized uploads before any of the file is decoded
+            if self.max_upload_size:
+                size = upload_size(file)
+                if size is not None and size > self.max_upload_size:
+                    logger.error(f"Upload too large: {size} bytes")
+                    return {
+                        "is_valid": False,
+                        "errors": ["File too large"],
+                        "extracted_info": None
+                    }
+
+            # Open the upload stream directly; PIL only reads the header until pixels are needed
             try:
-                image_bytes = file.read()
-                image = Image.open(io.BytesIO(image_bytes))
-                logger.debug(f"Image opened successfully: {image.format} {image.size}")
+                file.stream.seek(0)
+                image = Image.open(file.stream)
+                logger.debug("Image opened successfully: %s %s", image.format, image.size)
             except Exception as e:
                 logger.error(f"Error opening image: {e}")
                 return {
@@ -68,18 +142,9 @@ class ValidationService:
                     "extracted_info": None
                 }
 
-            # Extracted ticket information is valid, proceed with validation
+            # validate_image has already checked the extracted information
             ticket_info = image_validation_result[1]
 
-            # Validate extracted information
-            ticket_validation_result = validate_ticket_info(ticket_info)
-            if not ticket_validation_result[0]:
-                return {
-                    "is_valid": False,
-                    "errors": [ticket_validation_result[2]],
-                    "extracted_info": ticket_info
-                }
-
             logger.info("Ticket validation successful")
             return {
                 "is_valid": True,
@@ -95,6 +160,45 @@ class ValidationService:
                 "extracted_info": None
             }
 
+    def validate_tickets(self, images: List[Image.Image]) -> List[Dict]:
+        """
+        Validate several ticket images, extracting them with batched OCR requests
+        
+        Args:
+            images: List of PIL Image objects
+            
+        Returns:
+            List of validation result dicts, in the same order as images
+        """
+        results = [None] * len(images)
+        to_extract = []
+        for index, image in enumerate(images):
+            error = check_image_dimensions(image)
+            if error:
+                results[index] = {"is_valid": False, "errors": [error], "extracted_info": None}
+            else:
+                to_extract.append(index)
+
+        extracted = extract_ticket_info_batch([images[index] for index in to_extract])
+
+        for index, ticket_info in zip(to_extract, extracted):
+            if not ticket_info:
+                results[index] = {
+                    "is_valid": False,
+                    "errors": ["Could not extract information from ticket. Please ensure the image is clear and contains visible ticket information."],
+                    "extracted_info": None
+                }
+                continue
+
+            is_valid, _, error = validate_ticket_info(ticket_info)
+            results[index] = {
+                "is_valid": is_valid,
+                "errors": [error] if error else [],
+                "extracted_info": ticket_info
+            }
+
+        return results
+
     def clear_cache(self):
         """Clear the OCR cache"""
         try:
@@ -104,6 +208,27 @@ class ValidationService:
             logger.error(f"Cache clear error: {str(e)}")
             return {"status": "error", "message": str(e)}
 
+def check_image_dimensions(image: Image.Image) -> Optional[str]:
+    """
+    Check that an image is usable for OCR
+    
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        Error message, or None if the image is acceptable
+    """
+    if not isinstance(image, Image.Image):
+        return "Invalid image format"
+        
+    if image.size[0] < 100 or image.size[1] < 100:
+        return "Image too small - minimum size is 100x100 pixels"
+        
+    if image.size[0] > 4000 or image.size[1] > 4000:
+        return "Image too large - maximum size is 4000x4000 pixels"
+
+    return None
+
 def validate_image(image: Image.Image) -> Tuple[bool, Dict, Optional[str]]:
     """
     Validate the uploaded image and extract ticket information
@@ -116,15 +241,9 @@ def validate_image(image: Image.Image) -> Tuple[bool, Dict, Optional[str]]:
     """
     try:
         # Basic image validation
-        if not isinstance(image, Image.Image):
-            return False, {}, "Invalid image format"
-            
-        # Check image dimensions
-        if image.size[0] < 100 or image.size[1] < 100:
-            return False, {}, "Image too small - minimum size is 100x100 pixels"
-            
-        if image.size[0] > 4000 or image.size[1] > 4000:
-            return False, {}, "Image too large - maximum size is 4000x4000 pixels"
+        error = check_image_dimensions(image)
+        if error:
+            return False, {}, error
             
         # Extract ticket information
         logger.info("Extracting ticket information")
@@ -155,44 +274,45 @@ def validate_ticket_info(ticket_info: Dict) -> Tuple[bool, Dict, Optional[str]]:
         Tuple of (success, ticket_info, error_message)
     """
     try:
-        # Check required fields
-        required_fields = ['passenger_name', 'flight_number', 'departure_date', 'departure', 'arrival']
-        missing_fields = [field for field in required_fields if not ticket_info.get(field)]
-        
-        if missing_fields:
+        # Check required fields; the missing list is only built when a field is absent
+        if not all(map(ticket_info.get, REQUIRED_FIELDS)):
+            missing_fields = [field for field in REQUIRED_FIELDS if not ticket_info.get(field)]
             return False, ticket_info, f"Missing required information: {', '.join(missing_fields)}"
             
         # Validate passenger name format (LASTNAME/FIRSTNAME)
-        if not re.match(r'^[A-Z]+/[A-Z]+$', ticket_info['passenger_name']):
+        if not _is_passenger_name(ticket_info['passenger_name']):
             return False, ticket_info, "Invalid passenger name format. Expected LASTNAME/FIRSTNAME"
             
         # Validate flight number format (2 letters followed by 1-4 digits)
-        if not re.match(r'^[A-Z]{2}\d{1,4}$', ticket_info['flight_number']):
+        if not _is_flight_number(ticket_info['flight_number']):
             return False, ticket_info, "Invalid flight number format. Expected airline code (2 letters) followed by 1-4 digits"
             
         # Validate date format and value
+        # fromisoformat also accepts compact and week dates; only take YYYY-MM-DD
+        departure_date_str = ticket_info['departure_date']
+        if (len(departure_date_str) != DATE_LENGTH
+                or departure_date_str[4] != '-' or departure_date_str[7] != '-'):
+            return False, ticket_info, DATE_FORMAT_ERROR
         try:
-            departure_date = datetime.strptime(ticket_info['departure_date'], '%Y-%m-%d')
-            if departure_date < datetime(2000, 1, 1):  # Basic sanity check
-                return False, ticket_info, "Invalid departure date - too old"
-        except ValueError:
-            return False, ticket_info, "Invalid date format. Expected YYYY-MM-DD"
+            departure_date = date.fromisoformat(departure_date_str)
+        except ValueError:  # non-digits, or month/day out of range
+            return False, ticket_info, DATE_FORMAT_ERROR
+        if departure_date < MIN_DEPARTURE_DATE:
+            return False, ticket_info, "Invalid departure date - too old"
             
         # Validate location information
-        for location_type in ['departure', 'arrival']:
+        for location_type in LOCATION_TYPES:
             location = ticket_info[location_type]
             if not isinstance(location, dict):
                 return False, ticket_info, f"Invalid {location_type} location format"
                 
             # Check required location fields
-            required_location_fields = ['city', 'country', 'iata_code']
-            missing_location_fields = [field for field in required_location_fields if not location.get(field)]
-            
-            if missing_location_fields:
+            if not all(map(location.get, REQUIRED_LOCATION_FIELDS)):
+                missing_location_fields = [field for field in REQUIRED_LOCATION_FIELDS if not location.get(field)]
                 return False, ticket_info, f"Missing {location_type} location information: {', '.join(missing_location_fields)}"
                 
             # Validate IATA code format (3 uppercase letters)
-            if not re.match(r'^[A-Z]{3}$', location['iata_code']):
+            if not _is_iata_code(location['iata_code']):
                 return False, ticket_info, f"Invalid {location_type} IATA code format. Expected 3 uppercase letters"
         
         # All validations passed
@@ -1,7 +1,10 @@
+import atexit
+import functools
 import logging
 import logging.handlers
 import os
-from datetime import datetime
+import queue
+from time import perf_counter
 
 class LoggerConfig:
     def __init__(self, log_dir='logs'):
@@ -11,6 +14,7 @@ class LoggerConfig:
         :param log_dir: Répertoire pour les fichiers de log
         """
         self.log_dir = log_dir
+        self.listeners = []
         self._ensure_log_directory()
         self._configure_logging()
 
@@ -38,7 +42,6 @@ class LoggerConfig:
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(formatter)
-        root_logger.addHandler(error_handler)
 
         # Handler pour les logs d'information
         info_handler = logging.handlers.RotatingFileHandler(
@@ -48,13 +51,12 @@ class LoggerConfig:
         )
         info_handler.setLevel(logging.INFO)
         info_handler.setFormatter(formatter)
-        root_logger.addHandler(info_handler)
 
         # Handler pour la console
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        self._attach_queue(root_logger, error_handler, info_handler, console_handler)
 
         # Logger spécifique pour les validations de billets
         ticket_handler = logging.handlers.RotatingFileHandler(
@@ -66,7 +68,7 @@ class LoggerConfig:
         ticket_handler.setFormatter(formatter)
         
         ticket_logger = logging.getLogger('ticket_validation')
-        ticket_logger.addHandler(ticket_handler)
+        self._attach_queue(ticket_logger, ticket_handler)
         ticket_logger.setLevel(logging.INFO)
 
         # Logger pour les appels API
@@ -79,18 +81,34 @@ class LoggerConfig:
         api_handler.setFormatter(formatter)
         
         api_logger = logging.getLogger('api_calls')
-        api_logger.addHandler(api_handler)
+        self._attach_queue(api_logger, api_handler)
         api_logger.setLevel(logging.INFO)
 
+    def _attach_queue(self, logger, *handlers):
+        """
+        Relie un logger à ses handlers via une file: le thread appelant ne fait qu'un put,
+        les écritures disque et les rotations ont lieu dans le thread du QueueListener
+        """
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        # Vide la file avant l'arrêt de l'interpréteur
+        atexit.register(listener.stop)
+        self.listeners.append(listener)
+
 def log_api_call(func):
     """Décorateur pour logger les appels API"""
+    # Logger résolu une seule fois, à la décoration
+    logger = logging.getLogger('api_calls')
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = logging.getLogger('api_calls')
-        start_time = datetime.now()
+        start_time = perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = perf_counter() - start_time
             
             logger.info(
                 f"API Call - Function: {func.__name__} - "
@@ -100,7 +118,7 @@ def log_api_call(func):
             return result
             
         except Exception as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = perf_counter() - start_time
             logger.error(
                 f"API Call - Function: {func.__name__} - "
                 f"Duration: {duration:.2f}s - Error: {str(e)}"
@@ -111,13 +129,15 @@ def log_api_call(func):
 
 def log_validation(func):
     """Décorateur pour logger les validations de billets"""
+    logger = logging.getLogger('ticket_validation')
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = logging.getLogger('ticket_validation')
-        start_time = datetime.now()
+        start_time = perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = perf_counter() - start_time
             
             is_valid = result[0] if isinstance(result, tuple) else result.get('is_valid')
             errors = result[1] if isinstance(result, tuple) else result.get('errors', [])
@@ -135,7 +155,7 @@ def log_validation(func):
             return result
             
         except Exception as e:
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = perf_counter() - start_time
             logger.error(
                 f"Ticket Validation - Duration: {duration:.2f}s - "
                 f"Error: {str(e)}"
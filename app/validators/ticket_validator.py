@@ -1,6 +1,27 @@
 import re
 from datetime import datetime
 
+PASSENGER_NAME_RE = re.compile(r'^[A-Z]+/[A-Z][a-z]+$', re.ASCII)  # LASTNAME/Firstname
+FLIGHT_NUMBER_RE = re.compile(r'^[A-Z]{2,3}\d{1,4}[A-Z]?$', re.ASCII)
+TICKET_NUMBER_RE = re.compile(r'^\d{3}-\d{10}$', re.ASCII)
+IATA_CODE_RE = re.compile(r'^[A-Z]{3}$', re.ASCII)
+
+DATE_FORMAT_ERROR = "Format de date incorrect (doit être YYYY-MM-DD)"
+
+def _date_parts(date_str):
+    """
+    Split a YYYY-MM-DD string into (year, month, day) ints.
+    Like strptime('%Y-%m-%d'), the year needs 4 digits and month and day 1 or 2.
+    Returns None when the string does not have that shape.
+    """
+    parts = date_str.split('-')
+    if len(parts) != 3 or not all(part.isascii() and part.isdigit() for part in parts):
+        return None
+    year, month, day = parts
+    if len(year) != 4 or not 1 <= len(month) <= 2 or not 1 <= len(day) <= 2:
+        return None
+    return tuple(map(int, parts))
+
 def validate_ticket_number(ticket_number):
     """
     Validate ticket number format.
@@ -21,87 +42,104 @@ def validate_ticket_number(ticket_number):
     
     return None
 
-def validate_ticket_data(ticket_data):
+def _format_check(pattern, message):
+    """Build a check returning message when the value does not match pattern"""
+    def check(value, now):
+        return None if pattern.match(value) else message
+    return check
+
+def _check_departure_date(value, now):
+    """Check the departure date format and that it is not in the past"""
+    parts = _date_parts(value)
+    if parts is None:
+        return DATE_FORMAT_ERROR
+    try:
+        departure_date = datetime(*parts)
+    except ValueError:  # month or day out of range
+        return DATE_FORMAT_ERROR
+    if departure_date < now:
+        return "La date de départ est dans le passé"
+    return None
+
+# (field, message when missing, format check or None), in error-reporting order
+TICKET_FIELD_RULES = (
+    ('passenger_name', "Nom du passager manquant",
+     _format_check(PASSENGER_NAME_RE, "Format du nom incorrect (doit être LASTNAME/Firstname)")),
+    ('flight_number', "Numéro de vol manquant",
+     _format_check(FLIGHT_NUMBER_RE, "Format du numéro de vol incorrect")),
+    ('departure_date', "Date de départ manquante", _check_departure_date),
+    ('ticket_number', "Numéro de billet manquant",
+     _format_check(TICKET_NUMBER_RE, "Format du numéro de billet incorrect")),
+)
+
+# (location, message when missing, field rules for that location)
+LOCATION_RULES = (
+    ('departure', "Informations de départ manquantes", (
+        ('iata_code', "Code IATA de départ manquant",
+         _format_check(IATA_CODE_RE, "Format du code IATA de départ incorrect")),
+        ('city', "Ville de départ manquante", None),
+        ('country', "Pays de départ manquant", None),
+        ('terminal', "Terminal de départ manquant", None),
+    )),
+    ('arrival', "Informations d'arrivée manquantes", (
+        ('iata_code', "Code IATA d'arrivée manquant",
+         _format_check(IATA_CODE_RE, "Format du code IATA d'arrivée incorrect")),
+        ('city', "Ville d'arrivée manquante", None),
+        ('country', "Pays d'arrivée manquant", None),
+        ('terminal', "Terminal d'arrivée manquant", None),
+    )),
+)
+
+def _apply_rules(data, rules, errors, now):
+    """Append to errors the message of every rule data does not satisfy"""
+    for field, missing_message, check in rules:
+        value = data.get(field)
+        if not value:
+            errors.append(missing_message)
+        elif check is not None:
+            error = check(value, now)
+            if error:
+                errors.append(error)
+
+def validate_ticket_data(ticket_data, now=None):
     """
     Validate extracted ticket information
     Returns dict with is_valid flag and list of errors
     """
+    if now is None:
+        now = datetime.now()
     errors = []
-    
-    # Validate passenger name format (LASTNAME/FIRSTNAME)
-    if not ticket_data.get('passenger_name'):
-        errors.append("Nom du passager manquant")
-    elif not re.match(r'^[A-Z]+/[A-Z][a-z]+$', ticket_data['passenger_name']):
-        errors.append("Format du nom incorrect (doit être LASTNAME/Firstname)")
-    
-    # Validate flight number format
-    if not ticket_data.get('flight_number'):
-        errors.append("Numéro de vol manquant")
-    elif not re.match(r'^[A-Z]{2,3}\d{1,4}[A-Z]?$', ticket_data['flight_number']):
-        errors.append("Format du numéro de vol incorrect")
-    
-    # Validate departure date format and logic
-    if not ticket_data.get('departure_date'):
-        errors.append("Date de départ manquante")
-    else:
-        try:
-            departure_date = datetime.strptime(ticket_data['departure_date'], '%Y-%m-%d')
-            if departure_date < datetime.now():
-                errors.append("La date de départ est dans le passé")
-        except ValueError:
-            errors.append("Format de date incorrect (doit être YYYY-MM-DD)")
-    
-    # Validate ticket number
-    if not ticket_data.get('ticket_number'):
-        errors.append("Numéro de billet manquant")
-    elif not re.match(r'^\d{3}-\d{10}$', ticket_data['ticket_number']):
-        errors.append("Format du numéro de billet incorrect")
-    
-    # Validate departure location
-    if not ticket_data.get('departure'):
-        errors.append("Informations de départ manquantes")
-    else:
-        departure = ticket_data['departure']
-        if not departure.get('iata_code'):
-            errors.append("Code IATA de départ manquant")
-        elif not re.match(r'^[A-Z]{3}$', departure['iata_code']):
-            errors.append("Format du code IATA de départ incorrect")
-        
-        if not departure.get('city'):
-            errors.append("Ville de départ manquante")
-        if not departure.get('country'):
-            errors.append("Pays de départ manquant")
-        if not departure.get('terminal'):
-            errors.append("Terminal de départ manquant")
-    
-    # Validate arrival location
-    if not ticket_data.get('arrival'):
-        errors.append("Informations d'arrivée manquantes")
-    else:
-        arrival = ticket_data['arrival']
-        if not arrival.get('iata_code'):
-            errors.append("Code IATA d'arrivée manquant")
-        elif not re.match(r'^[A-Z]{3}$', arrival['iata_code']):
-            errors.append("Format du code IATA d'arrivée incorrect")
-        
-        if not arrival.get('city'):
-            errors.append("Ville d'arrivée manquante")
-        if not arrival.get('country'):
-            errors.append("Pays d'arrivée manquant")
-        if not arrival.get('terminal'):
-            errors.append("Terminal d'arrivée manquant")
+    _apply_rules(ticket_data, TICKET_FIELD_RULES, errors, now)
+
+    for location_type, missing_message, rules in LOCATION_RULES:
+        location = ticket_data.get(location_type)
+        if not location:
+            errors.append(missing_message)
+        else:
+            _apply_rules(location, rules, errors, now)
     
     return {
         'is_valid': len(errors) == 0,
         'errors': errors
     }
 
+def validate_tickets_data(tickets):
+    """
+    Validate several extracted tickets against the same reference time
+    Returns a list of validate_ticket_data results, in input order
+    """
+    now = datetime.now()
+    return [validate_ticket_data(ticket_data, now) for ticket_data in tickets]
+
 def validate_date_format(date_str):
     """
     Validate that the date string is in YYYY-MM-DD format
     """
+    parts = _date_parts(date_str)
+    if parts is None:
+        return False
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
-        return True
-    except ValueError:
+        datetime(*parts)
+    except ValueError:  # month or day out of range
         return False
+    return True
@@ -1,8 +1,20 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+ENV_LOADED_FLAG = 'APP_CONFIG_LOADED'
+
+def load_environment():
+    """
+    Load environment variables from .env file, once per process
+    
+    Skipped in production, where the environment is provided by the deployment.
+    """
+    if os.environ.get(ENV_LOADED_FLAG) or os.environ.get('FLASK_ENV') == 'production':
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    os.environ[ENV_LOADED_FLAG] = '1'
+
+load_environment()
 
 class Config:
     # Application Configuration
@@ -16,7 +28,7 @@ class Config:
     
     # OCR and Validation Configuration
     OCR_PROVIDER = os.getenv('OCR_PROVIDER', 'claude')
-    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', '10 * 1024 * 1024'))  # 10 MB default
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE') or 10 * 1024 * 1024)  # 10 MB default
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -44,5 +56,6 @@ class Config:
         
         return True
 
-# Validate configuration on import
-Config.validate_config()
+class TestingConfig(Config):
+    # create_app skips validate_config: tests run without API credentials
+    TESTING = True
@@ -1,20 +1,23 @@
 from flask import Flask
 import os
-from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
 from app.routes import bp
+from config import Config, load_environment
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (no-op if config already did)
+load_environment()
 
 def create_app(testing=False):
     """Create and configure the Flask application"""
     
     app = Flask(__name__)
     
+    if not testing:
+        Config.validate_config()
+    
     # Configure app
-    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))  # Default 10MB
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_SIZE') or 10 * 1024 * 1024)  # Default 10MB
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     app.config['TESTING'] = testing
     
@@ -22,6 +25,9 @@ def create_app(testing=False):
     if not testing:
         configure_logging(app)
     
+    # Services are created lazily on first request (see routes.get_validation_service)
+    app.extensions['validation_service'] = None
+    
     # Register blueprints
     app.register_blueprint(bp)
     
@@ -1,17 +1,135 @@
 import pytest
+import anthropic
+import httpx
+import json
 from app import create_app
+from config import TestingConfig
+from app.services import ocr_service
+from app.services.amadeus_service import AmadeusService
 import os
 import tempfile
 
+KNOWN_AIRPORTS = {"CDG", "JFK", "LAX"}
+KNOWN_CARRIERS = ("AF", "BA", "LH")
+
+# Billet renvoyé par l'API Claude simulée
+CLAUDE_TICKET = {
+    "passenger_name": "DOE/JOHN",
+    "flight_number": "AF123",
+    "departure_date": "2030-12-25",
+    "departure": {"city": "Paris", "country": "France", "iata_code": "CDG"},
+    "arrival": {"city": "New York", "country": "USA", "iata_code": "JFK"}
+}
+
+def claude_message(text):
+    """Réponse de l'API Messages dont le contenu est le texte donné"""
+    return httpx.Response(200, json={
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-opus-20240229",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 1, "output_tokens": 1}
+    })
+
+# Sérialisé une seule fois: la réponse par défaut est identique pour toutes les requêtes
+CLAUDE_TICKET_JSON = json.dumps(CLAUDE_TICKET)
+
+def _claude_messages_handler(request):
+    """Répond à tout appel de l'API Messages avec le billet simulé"""
+    return claude_message(CLAUDE_TICKET_JSON)
+
+class ScriptedClaudeAPI:
+    """API Messages simulée: sert les réponses programmées, puis le billet par défaut"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def reply(self, text):
+        """Programme une réponse dont le contenu est le texte donné"""
+        self.responses.append(lambda body: claude_message(text))
+
+    def reply_with(self, build_text):
+        """Programme une réponse dont le contenu est construit à partir du corps de la requête"""
+        self.responses.append(lambda body: claude_message(build_text(body)))
+
+    def fail(self, status_code, headers=None):
+        """Programme une réponse d'erreur HTTP"""
+        self.responses.append(lambda body: httpx.Response(status_code, headers=headers, json={
+            "type": "error",
+            "error": {"type": "api_error", "message": "Simulated error"}
+        }))
+
+    def disconnect(self):
+        """Programme une erreur de connexion"""
+        def fail(body):
+            raise httpx.ConnectError("Simulated connection error")
+        self.responses.append(fail)
+
+    def handler(self, request):
+        body = json.loads(request.content)
+        self.requests.append(body)
+        if self.responses:
+            return self.responses.pop(0)(body)
+        return _claude_messages_handler(request)
+
+@pytest.fixture(scope="session")
+def claude_client():
+    """Client Claude branché sur un MockTransport httpx: les requêtes ne quittent jamais le processus"""
+    http_client = httpx.Client(transport=httpx.MockTransport(_claude_messages_handler))
+    yield anthropic.Anthropic(api_key="test-key", max_retries=0, http_client=http_client)
+    http_client.close()
+
+@pytest.fixture(autouse=True)
+def mock_claude(monkeypatch, claude_client):
+    """Remplace le client Claude partagé par le client simulé, y compris pour les appels non mockés"""
+    monkeypatch.setattr(ocr_service, "get_claude_client", lambda api_key: claude_client)
+
 @pytest.fixture
+def claude_api(monkeypatch):
+    """API Claude scriptée pour un test, avec une clé d'API configurée"""
+    api = ScriptedClaudeAPI()
+    http_client = httpx.Client(transport=httpx.MockTransport(api.handler))
+    client = anthropic.Anthropic(api_key="test-key", max_retries=0, http_client=http_client)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(ocr_service, "get_claude_client", lambda api_key: client)
+    yield api
+    http_client.close()
+
+@pytest.fixture(autouse=True)
+def ocr_cache(monkeypatch, tmp_path):
+    """Cache OCR isolé par test: rien n'est écrit dans le dépôt ni servi depuis une exécution précédente"""
+    monkeypatch.setattr(ocr_service, "CACHE_DIR", tmp_path)
+    ocr_service._MEM_CACHE.clear()
+    yield tmp_path
+    ocr_service._MEM_CACHE.clear()
+
+@pytest.fixture
+def mock_amadeus(monkeypatch):
+    """Remplace les appels à l'API Amadeus par des réponses locales, pour les tests de bout en bout"""
+    def get_airport_info(self, iata_code):
+        return {"iata_code": iata_code} if iata_code in KNOWN_AIRPORTS else None
+
+    def validate_flight(self, flight_info):
+        if str(flight_info.get('flight_number') or '').startswith(KNOWN_CARRIERS):
+            return {"is_valid": True, "errors": [], "details": None}
+        return {"is_valid": False, "errors": ["Vol non trouvé dans la base Amadeus"], "details": None}
+
+    monkeypatch.setattr(AmadeusService, "get_airport_info", get_airport_info)
+    monkeypatch.setattr(AmadeusService, "validate_flight", validate_flight)
+
+@pytest.fixture(scope="module")
 def app():
-    """Créer une instance de l'application pour les tests"""
+    """Créer une instance de l'application, partagée par les tests d'un module"""
     # Créer un répertoire temporaire pour les uploads
     test_upload_folder = tempfile.mkdtemp()
     
-    app = create_app()
+    # TESTING doit être actif dès create_app pour ne pas exiger les identifiants API
+    app = create_app(TestingConfig)
     app.config.update({
-        'TESTING': True,
         'UPLOAD_FOLDER': test_upload_folder
     })
 
@@ -25,7 +143,7 @@ def app():
             os.rmdir(os.path.join(root, name))
     os.rmdir(test_upload_folder)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def client(app):
     """Client de test pour faire des requêtes à l'application"""
     return app.test_client()
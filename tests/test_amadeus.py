@@ -1,46 +1,218 @@
 import pytest
-from app.services.amadeus_service import AmadeusFlightService
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from amadeus import ClientError, NotFoundError, ServerError
+from app.services.amadeus_service import AmadeusService
+from app.services.cache_service import cache_service
 
-def test_amadeus_airport_details():
+FLIGHT = {
+    "flight_number": "AF123",
+    "departure_date": "2030-03-15",
+    "departure": {"iata_code": "CDG"},
+    "arrival": {"iata_code": "JFK"}
+}
+
+CDG = {
+    "iataCode": "CDG",
+    "name": "CHARLES DE GAULLE",
+    "address": {"cityName": "PARIS", "countryName": "FRANCE"}
+}
+
+def _schedule(carrier="AF", number="123", route=("CDG", "JFK")):
+    """Programme de vol au format de l'API Amadeus"""
+    return {
+        "flightDesignator": {"carrierCode": carrier, "flightNumber": number},
+        "flightPoints": [{"iataCode": code} for code in route]
+    }
+
+def _response(data):
+    return SimpleNamespace(data=data)
+
+def _amadeus_error(error_class, status_code):
+    """Erreur du SDK Amadeus telle que levée pour une réponse HTTP donnée"""
+    return error_class(SimpleNamespace(status_code=status_code, result={}, body='', parsed=True))
+
+@pytest.fixture
+def amadeus():
+    """Service configuré dont le client Amadeus est simulé, avec un cache vide"""
+    service = AmadeusService()
+    service._credentials = ('client-id', 'client-secret')
+    service._client = MagicMock()
+    cache_service.clear()
+    yield service
+    cache_service.clear()
+
+def test_amadeus_airport_details(amadeus):
     """Test la récupération des détails d'un aéroport"""
-    service = AmadeusFlightService()
-    
-    # Test avec un aéroport valide
-    airport_details = service.get_airport_details('CDG')
-    assert airport_details is not None
-    assert 'name' in airport_details
-    
-    # Test avec un code IATA invalide
-    airport_details = service.get_airport_details('XXX')
-    assert airport_details is None
-
-def test_amadeus_flight_validation():
+    amadeus.client.reference_data.locations.get.return_value = _response([CDG])
+
+    assert amadeus.get_airport_info('CDG') == {
+        "iata_code": "CDG",
+        "name": "CHARLES DE GAULLE",
+        "city": "PARIS",
+        "country": "FRANCE"
+    }
+
+    # Test avec un code IATA inconnu
+    amadeus.client.reference_data.locations.get.return_value = _response([])
+    assert amadeus.get_airport_info('XXX') is None
+
+def test_amadeus_flight_validation(amadeus):
     """Test la validation d'un vol"""
-    service = AmadeusFlightService()
-    
-    # Test avec un vol valide (à ajuster selon les disponibilités actuelles)
-    validation_result = service.validate_flight(
-        flight_number='AF123', 
-        departure_airport='CDG', 
-        arrival_airport='JFK', 
-        departure_time='2024-12-25T10:00:00'
-    )
-    
-    # Vérifier la structure de la réponse
-    assert 'is_valid' in validation_result
-    assert 'details' in validation_result or 'error' in validation_result
-
-def test_amadeus_flight_invalid():
-    """Test la validation d'un vol invalide"""
-    service = AmadeusFlightService()
-    
-    # Test avec des paramètres manifestement invalides
-    validation_result = service.validate_flight(
-        flight_number='XX999', 
-        departure_airport='ZZZ', 
-        arrival_airport='YYY', 
-        departure_time='2024-12-25T10:00:00'
+    amadeus.client.schedule.flights.get.return_value = _response([_schedule()])
+
+    validation_result = amadeus.validate_flight(FLIGHT)
+
+    assert validation_result['is_valid'] is True
+    assert validation_result['details']['departure'] == {"iata_code": "CDG"}
+    assert validation_result['details']['arrival'] == {"iata_code": "JFK"}
+    amadeus.client.schedule.flights.get.assert_called_once_with(
+        carrierCode='AF', flightNumber='123', scheduledDepartureDate='2030-03-15'
     )
-    
-    # Le vol devrait être considéré comme invalide
+
+def test_amadeus_flight_invalid(amadeus):
+    """Test la validation d'un vol dont l'itinéraire ne correspond pas"""
+    amadeus.client.schedule.flights.get.return_value = _response([_schedule(route=("ORY", "JFK"))])
+
+    validation_result = amadeus.validate_flight(FLIGHT)
+
     assert validation_result['is_valid'] is False
+    assert validation_result['errors'] == ["Les informations de vol ne correspondent pas aux données Amadeus"]
+
+@pytest.mark.parametrize("error", [
+    _amadeus_error(ClientError, 400),
+    _amadeus_error(NotFoundError, 404),
+], ids=["400", "404"])
+def test_definitive_miss_is_cached(amadeus, error):
+    """Test qu'une requête rejetée n'est pas renvoyée à Amadeus"""
+    amadeus.client.schedule.flights.get.side_effect = error
+
+    assert amadeus.validate_flight(FLIGHT)['is_valid'] is False
+    assert amadeus.validate_flight(FLIGHT)['is_valid'] is False
+    assert amadeus.client.schedule.flights.get.call_count == 1
+
+@pytest.mark.parametrize("error", [
+    _amadeus_error(ClientError, 429),
+    _amadeus_error(ServerError, 500),
+], ids=["429", "500"])
+def test_transient_error_is_not_cached(amadeus, error):
+    """Test qu'un quota dépassé ou une erreur serveur ne masque pas le vol ensuite"""
+    amadeus.client.schedule.flights.get.side_effect = [error, _response([_schedule()])]
+
+    assert amadeus.validate_flight(FLIGHT)['is_valid'] is False
+    assert amadeus.validate_flight(FLIGHT)['is_valid'] is True
+    assert amadeus.client.schedule.flights.get.call_count == 2
+
+class _CountingLock:
+    """Verrou qui signale chaque entrée, pour savoir quand tous les appelants sont enregistrés"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entered = threading.Semaphore(0)
+
+    def __enter__(self):
+        self._lock.acquire()
+        self.entered.release()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+CONCURRENT_CALLERS = 5
+
+def _validate_concurrently(amadeus, monkeypatch, data):
+    """Lance CONCURRENT_CALLERS validations du même vol pendant que l'appel Amadeus est en cours"""
+    inflight_lock = _CountingLock()
+    monkeypatch.setattr(AmadeusService, "_inflight_lock", inflight_lock)
+    amadeus.inflight_timeout = 5
+
+    def get_schedule(**params):
+        # Ne répond qu'une fois tous les appelants passés par le registre des appels en cours
+        for _ in range(CONCURRENT_CALLERS):
+            inflight_lock.entered.acquire(timeout=5)
+        return _response(data)
+
+    amadeus.client.schedule.flights.get.side_effect = get_schedule
+    with ThreadPoolExecutor(max_workers=CONCURRENT_CALLERS) as pool:
+        return list(pool.map(lambda _: amadeus.validate_flight(dict(FLIGHT)), range(CONCURRENT_CALLERS)))
+
+def test_concurrent_lookups_are_coalesced(amadeus, monkeypatch):
+    """Test qu'un seul appel Amadeus sert tous les appelants concurrents"""
+    results = _validate_concurrently(amadeus, monkeypatch, [_schedule()])
+
+    assert amadeus.client.schedule.flights.get.call_count == 1
+    assert [result['is_valid'] for result in results] == [True] * CONCURRENT_CALLERS
+
+def test_concurrent_lookup_error_reaches_all_callers(amadeus, monkeypatch):
+    """Test que l'erreur du premier appelant est transmise aux autres, sans résultat périmé"""
+    # Programme malformé: l'analyse de la réponse lève une exception
+    results = _validate_concurrently(amadeus, monkeypatch, [{}])
+
+    assert amadeus.client.schedule.flights.get.call_count == 1
+    assert [result['errors'] for result in results] == \
+        [["Erreur interne lors de la validation du vol"]] * CONCURRENT_CALLERS
+
+    # L'échec n'est ni en cache ni en cours: l'appel suivant interroge de nouveau Amadeus
+    amadeus.client.schedule.flights.get.side_effect = None
+    amadeus.client.schedule.flights.get.return_value = _response([_schedule()])
+    assert amadeus.validate_flight(FLIGHT)['is_valid'] is True
+    assert AmadeusService._inflight == {}
+
+def test_validate_flights(amadeus):
+    """Test la validation par lot: un appel par vol distinct, ordre conservé, erreurs isolées"""
+    threads = []
+
+    def get_schedule(carrierCode, flightNumber, scheduledDepartureDate):
+        threads.append(threading.current_thread().name)
+        return _response([_schedule(carrierCode, flightNumber)])
+
+    amadeus.client.schedule.flights.get.side_effect = get_schedule
+    other_flight = dict(FLIGHT, flight_number="AF456")
+    # Vol sans aéroport de départ: son erreur ne doit pas affecter les autres
+    malformed_flight = {"flight_number": "AF789", "departure_date": "2030-03-15"}
+
+    results = amadeus.validate_flights([FLIGHT, other_flight, dict(FLIGHT), malformed_flight])
+
+    assert [result['is_valid'] for result in results] == [True, True, True, False]
+    assert results[1]['details']['flight_number'] == "456"
+    assert results[3]['errors'] == ["Erreur interne lors de la validation du vol"]
+    # Les vols identiques sont fusionnés, et les appels partent du pool dédié
+    assert amadeus.client.schedule.flights.get.call_count == 2
+    assert all(name.startswith('amadeus') for name in threads)
+
+def test_get_airports_info(amadeus):
+    """Test la recherche groupée: codes dédoublonnés et cache partagé avec get_airport_info"""
+    airports = {"CDG": CDG, "JFK": {"iataCode": "JFK", "name": "JOHN F KENNEDY INTL"}}
+
+    def get_locations(keyword, subType):
+        return _response([airports[keyword]] if keyword in airports else [])
+
+    locations = amadeus.client.reference_data.locations
+    locations.get.side_effect = get_locations
+    cdg = amadeus.get_airport_info('CDG')
+
+    results = amadeus.get_airports_info(['JFK', 'CDG', 'XXX', 'JFK'])
+
+    assert results == [{"iata_code": "JFK", "name": "JOHN F KENNEDY INTL"}, cdg, None,
+                       {"iata_code": "JFK", "name": "JOHN F KENNEDY INTL"}]
+    # CDG vient du cache et JFK n'est demandé qu'une fois
+    assert sorted(call.kwargs['keyword'] for call in locations.get.call_args_list) == ['CDG', 'JFK', 'XXX']
+
+def test_airport_cache_key_and_clear(amadeus):
+    """Test la clé tuple du cache des aéroports et son vidage par préfixe"""
+    locations = amadeus.client.reference_data.locations
+    locations.get.return_value = _response([CDG])
+
+    amadeus.get_airport_info('cdg')
+    assert amadeus.get_airport_info('CDG')['name'] == "CHARLES DE GAULLE"
+    assert cache_service.cache.get(('amadeus_airport', 'CDG')) is not None
+    assert locations.get.call_count == 1
+
+    # Le vidage d'un autre préfixe conserve l'entrée, celui des aéroports la supprime
+    amadeus.clear_cache()
+    amadeus.get_airport_info('CDG')
+    assert locations.get.call_count == 1
+    cache_service.clear('amadeus_airport')
+    amadeus.get_airport_info('CDG')
+    assert locations.get.call_count == 2
@@ -0,0 +1,109 @@
+import pytest
+from app.services import cache_service
+from app.services.cache_service import InMemoryCache
+
+class FakeClock:
+    """Horloge monotone avancée à la main par le test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Remplace l'horloge du module de cache pour contrôler les expirations"""
+    clock = FakeClock()
+    monkeypatch.setattr(cache_service, "time", clock)
+    return clock
+
+def _same_shard_keys(cache, count):
+    """Clés tombant toutes dans le même segment, pour observer son éviction"""
+    target_lock, _, _ = cache._shard("key0")
+    keys = (f"key{i}" for i in range(10000))
+    return [key for key in keys if cache._shard(key)[0] is target_lock][:count]
+
+def test_size_is_bounded_after_overflow():
+    """Test que le cache reste sous max_entries quand on insère bien plus d'entrées"""
+    cache = InMemoryCache(max_entries=64)
+
+    for i in range(1000):
+        cache.set(f"key{i}", i)
+
+    assert len(cache) <= cache.max_entries
+    assert all(len(shard) <= cache._max_per_shard for shard in cache._shards)
+    assert cache.get("key999") == 999
+
+def test_rewritten_key_is_not_evicted_by_stale_heap_entry():
+    """Test qu'une clé réécrite survit à l'éviction de son ancienne expiration"""
+    cache = InMemoryCache(max_entries=64)  # 4 entrées par segment
+    first, second, third, fourth, fifth = _same_shard_keys(cache, 5)
+    for expiry, key in enumerate([first, second, third, fourth], start=1):
+        cache.set(key, key, expire_in_seconds=expiry * 10)
+    # La réécriture laisse dans le tas l'ancienne expiration, la plus proche
+    cache.set(first, "rewritten", expire_in_seconds=1000)
+
+    cache.set(fifth, fifth, expire_in_seconds=50)
+
+    # Le débordement évince les deux entrées vivantes les plus proches de l'expiration
+    assert cache.get(first) == "rewritten"
+    assert cache.get(second) is None
+    assert cache.get(third) is None
+    assert cache.get(fourth) == fourth
+    assert cache.get(fifth) == fifth
+
+def test_heap_is_compacted_on_rewrites():
+    """Test que les réécritures d'une même clé n'accumulent pas d'éléments périmés dans le tas"""
+    cache = InMemoryCache()
+    _, _, heap = cache._shard("key")
+
+    for i in range(500):
+        cache.set("key", i)
+
+    assert len(heap) <= 2 * len(cache) + 64
+    assert cache.get("key") == 499
+
+def test_expired_entry_is_not_returned(clock):
+    """Test qu'une entrée expirée n'est plus servie"""
+    cache = InMemoryCache()
+    cache.set("key", "value", expire_in_seconds=10)
+
+    clock.now += 10
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+def test_cleanup_removes_only_expired_entries(clock):
+    """Test que le nettoyage supprime les entrées expirées et conserve les autres"""
+    cache = InMemoryCache()
+    cache.set("expired", "value", expire_in_seconds=10)
+    cache.set("rewritten", "value", expire_in_seconds=10)
+    cache.set("live", "value", expire_in_seconds=100)
+    clock.now += 5
+    cache.set("rewritten", "new value", expire_in_seconds=100)
+
+    clock.now += 50
+    cache.cleanup()
+
+    assert len(cache) == 2
+    assert cache.get("rewritten") == "new value"
+    assert cache.get("live") == "value"
+
+def test_background_sweep_removes_expired_entries(clock):
+    """Test que l'écriture suivant scan_interval déclenche un nettoyage en arrière-plan"""
+    cache = InMemoryCache(scan_interval=60)
+    cache.set("expired", "value", expire_in_seconds=10)
+    clock.now += 30
+    cache.set("live", "value")
+    assert len(cache) == 2  # intervalle non écoulé: aucun nettoyage
+
+    clock.now += 31
+    cache.set("other", "value")
+    # Le nettoyeur détient le verrou jusqu'à la fin de son passage
+    assert cache._sweep_lock.acquire(timeout=5)
+    cache._sweep_lock.release()
+
+    assert len(cache) == 2
+    assert cache.get("live") == "value"
+    assert cache.get("other") == "value"
@@ -1,142 +1,265 @@
-import unittest
-from unittest.mock import patch, MagicMock
-from app.services.ocr_service import OCRService
-from PIL import Image, ImageDraw
-import tempfile
-import os
+import base64
+import io
 import json
+import pytest
+from pathlib import Path
+from PIL import Image
+from app.services import ocr_service
+from app.services.ocr_service import (
+    extract_ticket_info,
+    extract_ticket_info_batch,
+    encode_image_to_base64,
+    parse_claude_response,
+    image_media_type,
+    get_cache_key,
+    get_from_cache,
+    clear_cache
+)
 
-class TestOCRService(unittest.TestCase):
-    def setUp(self):
-        """Configuration initiale pour chaque test"""
-        self.ocr_service = OCRService()
-        self.test_image_path = self.create_test_image()
-
-    def tearDown(self):
-        """Nettoyage après chaque test"""
-        if hasattr(self, 'test_image_path') and os.path.exists(self.test_image_path):
-            os.remove(self.test_image_path)
-
-    def create_test_image(self):
-        """Crée une image de test avec du texte simulant un billet d'avion"""
-        image = Image.new('RGB', (800, 600), color='white')
-        draw = ImageDraw.Draw(image)
-        
-        text_content = [
-            "BOARDING PASS",
-            "Passenger Name: John Smith",
-            "Flight Number: AF123",
-            "From: CDG",
-            "To: JFK",
-            "Departure: 2024-03-15 10:30",
-            "Arrival: 2024-03-15 12:45"
-        ]
-        
-        y_position = 50
-        for text in text_content:
-            draw.text((50, y_position), text, fill='black')
-            y_position += 40
-            
-        temp_path = os.path.join(tempfile.gettempdir(), 'test_ticket.png')
-        image.save(temp_path)
-        return temp_path
-
-    @patch('httpx.post')
-    def test_extract_text_success(self, mock_post):
-        """Test l'extraction réussie du texte"""
-        # Simuler une réponse réussie de l'API
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'content': [{'text': 'BOARDING PASS\nPassenger: John Smith\nFlight: AF123'}]
-        }
-        mock_post.return_value = mock_response
-
-        result = self.ocr_service.extract_text_from_file(self.test_image_path)
-        self.assertIn('BOARDING PASS', result)
-        self.assertIn('John Smith', result)
-
-    @patch('httpx.post')
-    def test_extract_ticket_info_success(self, mock_post):
-        """Test l'extraction réussie des informations structurées"""
-        # Simuler une réponse réussie de l'API
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'content': [{
-                'text': json.dumps({
-                    'passenger_name': 'John Smith',
-                    'flight_number': 'AF123',
-                    'departure_airport': 'CDG',
-                    'arrival_airport': 'JFK',
-                    'departure_time': '2024-03-15 10:30',
-                    'arrival_time': '2024-03-15 12:45'
-                })
-            }]
-        }
-        mock_post.return_value = mock_response
-
-        result = self.ocr_service.extract_ticket_info(self.test_image_path)
-        self.assertEqual(result['passenger_name'], 'John Smith')
-        self.assertEqual(result['flight_number'], 'AF123')
-        self.assertEqual(result['departure_airport'], 'CDG')
-
-    @patch('httpx.post')
-    def test_api_error_handling(self, mock_post):
-        """Test la gestion des erreurs de l'API"""
-        # Simuler une erreur de l'API
-        mock_post.side_effect = Exception("API Error")
-
-        result = self.ocr_service.extract_text_from_file(self.test_image_path)
-        self.assertEqual(result, "")
-
-        result = self.ocr_service.extract_ticket_info(self.test_image_path)
-        self.assertIsNone(result['passenger_name'])
-        self.assertIsNone(result['flight_number'])
-
-    def test_invalid_file_path(self):
-        """Test avec un chemin de fichier invalide"""
-        result = self.ocr_service.extract_text_from_file("invalid_path.png")
-        self.assertEqual(result, "")
-
-        result = self.ocr_service.extract_ticket_info("invalid_path.png")
-        self.assertIsNone(result['passenger_name'])
-
-    @patch('httpx.post')
-    def test_malformed_json_response(self, mock_post):
-        """Test la gestion des réponses JSON malformées"""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'content': [{'text': 'Invalid JSON'}]
-        }
-        mock_post.return_value = mock_response
-
-        result = self.ocr_service.extract_ticket_info(self.test_image_path)
-        self.assertIsNone(result['passenger_name'])
-
-    @patch('httpx.post')
-    def test_missing_api_key(self, mock_post):
-        """Test le comportement sans clé API"""
-        # Sauvegarder la clé API actuelle
-        original_key = self.ocr_service.api_key
-        self.ocr_service.api_key = None
-
-        result = self.ocr_service.extract_text_from_file(self.test_image_path)
-        self.assertEqual(result, "")
-
-        result = self.ocr_service.extract_ticket_info(self.test_image_path)
-        self.assertIsNone(result['passenger_name'])
-
-        # Restaurer la clé API
-        self.ocr_service.api_key = original_key
-
-    def test_pdf_handling(self):
-        """Test le traitement des fichiers PDF"""
-        # Ce test nécessiterait un fichier PDF de test
-        # Pour l'instant, nous vérifions juste que la méthode existe
-        self.assertTrue(hasattr(self.ocr_service, 'extract_text_from_file'))
-        self.assertTrue(hasattr(self.ocr_service, 'extract_ticket_info'))
-
-if __name__ == '__main__':
-    unittest.main()
+FIXTURES = Path(__file__).parent / "fixtures"
+# Images statiques lues une fois à l'import: l'OCR est simulé et n'inspecte jamais les pixels
+DUMMY_PNG_BYTES = (FIXTURES / "dummy.png").read_bytes()
+TICKET_PNG_BYTES = (FIXTURES / "ticket.png").read_bytes()
+
+_TICKET = {
+    "passenger_name": "SMITH/JOHN",
+    "flight_number": "AF123",
+    "departure_date": "2030-03-15",
+    "departure": {"city": "Paris", "country": "France", "iata_code": "CDG"},
+    "arrival": {"city": "New York", "country": "USA", "iata_code": "JFK"}
+}
+# Réponse structurée constante, sérialisée une seule fois à l'import
+_TICKET_JSON = json.dumps(_TICKET)
+
+def _png(shade):
+    """Image PNG distincte par teinte, pour éviter les hits de cache entre images"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), (shade, shade, shade)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def test_extract_ticket_info_success(claude_api):
+    """Test l'extraction réussie des informations structurées"""
+    claude_api.reply(_TICKET_JSON)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+
+    request = claude_api.requests[0]
+    assert request['system'] == ocr_service.SYSTEM_PROMPT
+    # Le PNG est envoyé tel quel, sans réencodage
+    source = request['messages'][0]['content'][0]['source']
+    assert source['media_type'] == 'image/png'
+    assert base64.b64decode(source['data']) == DUMMY_PNG_BYTES
+
+def test_extract_ticket_info_from_pil_image(claude_api):
+    """Test l'extraction à partir d'une image PIL plutôt que d'octets"""
+    claude_api.reply(_TICKET_JSON)
+    image = Image.open(io.BytesIO(TICKET_PNG_BYTES))
+
+    assert extract_ticket_info(image) == _TICKET
+
+def test_extract_ticket_info_uses_cache(claude_api):
+    """Test qu'une même image n'est envoyée qu'une fois à Claude"""
+    claude_api.reply(_TICKET_JSON)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    assert len(claude_api.requests) == 1
+
+def test_cached_result_is_a_copy(claude_api):
+    """Test qu'un appelant qui modifie le résultat n'altère pas l'entrée en cache"""
+    claude_api.reply(_TICKET_JSON)
+
+    first = extract_ticket_info(DUMMY_PNG_BYTES)
+    first['departure']['iata_code'] = 'ORY'
+    second = extract_ticket_info(DUMMY_PNG_BYTES)
+    second['passenger_name'] = None
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    assert len(claude_api.requests) == 1
+
+def test_api_error_handling(claude_api):
+    """Test la gestion des erreurs de l'API: une requête invalide n'est pas retentée"""
+    claude_api.fail(400)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    assert len(claude_api.requests) == 1
+
+@pytest.fixture
+def no_retry_delay(monkeypatch):
+    """Supprime l'attente entre deux tentatives"""
+    monkeypatch.setattr(ocr_service, "_retry_delay", lambda error, attempt: 0)
+
+@pytest.mark.parametrize("fail", [
+    lambda api: api.fail(500),
+    lambda api: api.fail(503),
+    lambda api: api.fail(408),
+    lambda api: api.disconnect(),
+], ids=["500", "503", "408", "connection"])
+def test_transient_errors_are_retried(claude_api, no_retry_delay, fail):
+    """Test la reprise après une erreur serveur ou réseau transitoire"""
+    fail(claude_api)
+    claude_api.reply(_TICKET_JSON)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    assert len(claude_api.requests) == 2
+
+@pytest.fixture
+def claude_limiter(monkeypatch):
+    """Limiteur de concurrence neuf, pour observer son évolution pendant un test"""
+    limiter = ocr_service.AIMDLimiter(initial=4)
+    monkeypatch.setattr(ocr_service, "_claude_limiter", limiter)
+    return limiter
+
+@pytest.mark.parametrize("status_code", [429, 529])
+def test_overload_is_retried_and_shrinks_limit(claude_api, claude_limiter, status_code):
+    """Test la reprise après un 429 ou un 529, et la réduction du limiteur"""
+    claude_api.fail(status_code, headers={'retry-after': '0'})
+    claude_api.reply(_TICKET_JSON)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    assert len(claude_api.requests) == 2
+    # Divisé par deux (4 -> 2) puis augmenté d'un demi par le succès
+    assert claude_limiter.limit == 2
+
+def test_limiter_grows_only_on_success():
+    """Test que seuls les succès agrandissent la fenêtre, et seules les surcharges la réduisent"""
+    limiter = ocr_service.AIMDLimiter(initial=4, maximum=5)
+
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release()  # Échec non lié à une surcharge: fenêtre inchangée
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(succeeded=True)
+    assert limiter.limit == 5  # Plafonnée au maximum
+
+    limiter.acquire()
+    limiter.release(overloaded=True)
+    assert limiter.limit == 2
+
+def test_failed_call_does_not_grow_limit(claude_api, claude_limiter):
+    """Test qu'une erreur non retentée ne compte pas comme un succès"""
+    claude_api.fail(400)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    # limit arrondit à l'entier: la valeur exacte détecte une hausse d'un demi
+    assert claude_limiter._limit == 4.0
+
+def test_retries_are_bounded(claude_api, no_retry_delay):
+    """Test l'abandon après CLAUDE_MAX_RETRIES nouvelles tentatives"""
+    for _ in range(ocr_service.CLAUDE_MAX_RETRIES + 1):
+        claude_api.fail(500)
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    assert len(claude_api.requests) == ocr_service.CLAUDE_MAX_RETRIES + 1
+
+def test_invalid_image(claude_api):
+    """Test avec des octets qui ne sont pas une image"""
+    assert extract_ticket_info(b"not an image") is None
+    assert claude_api.requests == []
+
+def test_malformed_json_response(claude_api):
+    """Test la gestion des réponses JSON malformées, mémorisées comme échec"""
+    claude_api.reply('Invalid JSON')
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    # L'échec est en cache négatif: l'image n'est pas renvoyée à Claude
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    assert len(claude_api.requests) == 1
+
+def test_missing_fields_response(claude_api):
+    """Test une réponse à laquelle il manque des champs obligatoires"""
+    claude_api.reply(json.dumps({'passenger_name': 'SMITH/JOHN'}))
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+
+def test_missing_api_key(claude_api, monkeypatch):
+    """Test le comportement sans clé API"""
+    monkeypatch.delenv('ANTHROPIC_API_KEY')
+
+    assert extract_ticket_info(DUMMY_PNG_BYTES) is None
+    assert extract_ticket_info_batch([DUMMY_PNG_BYTES]) == [None]
+    assert claude_api.requests == []
+
+def test_full_batch_max_tokens_within_model_limit(claude_api):
+    """Un lot complet ne doit pas dépasser la limite de sortie du modèle"""
+    images = [_png(shade) for shade in range(ocr_service.BATCH_MAX_IMAGES)]
+    claude_api.reply_with(lambda body: json.dumps([_TICKET] * len(images)))
+
+    results = extract_ticket_info_batch(images)
+
+    assert len(claude_api.requests) == 1
+    # Limite de sortie de claude-3-opus: au-delà, l'API rejette la requête
+    assert claude_api.requests[0]['max_tokens'] <= 4096
+    assert results == [_TICKET] * len(images)
+
+def test_batch_serves_cached_images(claude_api):
+    """Test que seules les images absentes du cache partent dans le lot"""
+    claude_api.reply(_TICKET_JSON)
+    assert extract_ticket_info(DUMMY_PNG_BYTES) == _TICKET
+    claude_api.reply(json.dumps([_TICKET]))
+
+    results = extract_ticket_info_batch([DUMMY_PNG_BYTES, TICKET_PNG_BYTES])
+
+    assert results == [_TICKET, _TICKET]
+    assert len(claude_api.requests) == 2
+    batch_images = [block for block in claude_api.requests[1]['messages'][0]['content']
+                    if block['type'] == 'image']
+    assert len(batch_images) == 1
+
+def test_encode_image_keeps_png():
+    """Test qu'un PNG de taille raisonnable n'est pas réencodé"""
+    raw_bytes, b64_str = encode_image_to_base64(DUMMY_PNG_BYTES)
+
+    assert bytes(raw_bytes) == DUMMY_PNG_BYTES
+    assert image_media_type(raw_bytes) == 'image/png'
+    assert base64.b64decode(b64_str) == DUMMY_PNG_BYTES
+
+def test_encode_image_converts_rgba_to_jpeg():
+    """Test la conversion en JPEG d'une image sans octets source"""
+    raw_bytes, b64_str = encode_image_to_base64(Image.new('RGBA', (20, 20), (255, 0, 0, 128)))
+
+    assert image_media_type(raw_bytes) == 'image/jpeg'
+    assert Image.open(io.BytesIO(base64.b64decode(b64_str))).mode == 'RGB'
+
+def test_encode_image_downscales_large_images():
+    """Test la réduction des images dont le grand côté dépasse MAX_IMAGE_EDGE"""
+    image = Image.new('RGB', (ocr_service.MAX_IMAGE_EDGE * 2, 100))
+
+    raw_bytes, _ = encode_image_to_base64(image)
+
+    assert max(Image.open(io.BytesIO(raw_bytes)).size) == ocr_service.MAX_IMAGE_EDGE
+
+@pytest.mark.parametrize("text", [
+    '{"flight_number": "AF123"}',
+    '  {"flight_number": "AF123"}\n',
+    '```json\n{"flight_number": "AF123"}\n```',
+    '```\n{"flight_number": "AF123"}\n```',
+])
+def test_parse_claude_response(text):
+    """Test l'analyse du JSON renvoyé par Claude, avec ou sans bloc de code"""
+    assert parse_claude_response(text) == {"flight_number": "AF123"}
+
+def test_parse_claude_response_invalid():
+    """Test qu'une réponse non JSON lève une erreur de décodage"""
+    with pytest.raises(json.JSONDecodeError):
+        parse_claude_response('Invalid JSON')
+
+def test_disk_cache_roundtrip(ocr_cache):
+    """Test la relecture d'une entrée depuis le disque puis le vidage du cache"""
+    cache_key = get_cache_key(DUMMY_PNG_BYTES)
+    ocr_service._write_cache_file(ocr_cache / f"{cache_key}.json", _TICKET)
+
+    assert get_from_cache(cache_key) == _TICKET
+
+    assert clear_cache()
+    assert list(ocr_cache.glob('*.json')) == []
+    assert get_from_cache(cache_key) is None
+
+def test_cache_write_failure_leaves_no_temp_file(ocr_cache):
+    """Test qu'une écriture en échec ne laisse aucun fichier temporaire"""
+    ocr_service._write_cache_file(ocr_cache / "entry.json", {"value": object()})
+
+    assert list(ocr_cache.iterdir()) == []
@@ -0,0 +1,43 @@
+import json
+from PIL import Image
+from app.services.validation_service import ValidationService
+
+_TICKET = {
+    "passenger_name": "SMITH/JOHN",
+    "flight_number": "AF123",
+    "departure_date": "2030-03-15",
+    "departure": {"city": "Paris", "country": "France", "iata_code": "CDG"},
+    "arrival": {"city": "New York", "country": "USA", "iata_code": "JFK"}
+}
+
+def _image(shade, size=(100, 100)):
+    """Image distincte par teinte, pour éviter les hits de cache entre images"""
+    return Image.new('RGB', size, (shade, shade, shade))
+
+def test_validate_tickets(claude_api):
+    """Test la validation par lot: ordre conservé et erreurs propres à chaque image"""
+    invalid_ticket = {**_TICKET, "flight_number": "123AF"}
+    # Une réponse par image envoyée, dans l'ordre: billet valide, billet invalide, contenu illisible
+    claude_api.reply(json.dumps([_TICKET, invalid_ticket, "not a ticket"]))
+    images = [_image(10), _image(20, size=(50, 50)), _image(30), _image(40)]
+
+    results = ValidationService().validate_tickets(images)
+
+    assert results[0] == {"is_valid": True, "errors": [], "extracted_info": _TICKET}
+    # L'image trop petite est rejetée sans partir dans le lot
+    assert results[1] == {
+        "is_valid": False,
+        "errors": ["Image too small - minimum size is 100x100 pixels"],
+        "extracted_info": None
+    }
+    assert results[2]["is_valid"] is False
+    assert results[2]["extracted_info"] == invalid_ticket
+    assert results[2]["errors"][0].startswith("Invalid flight number format")
+    assert results[3]["is_valid"] is False
+    assert results[3]["extracted_info"] is None
+    assert results[3]["errors"][0].startswith("Could not extract information from ticket")
+
+    assert len(claude_api.requests) == 1
+    batch_images = [block for block in claude_api.requests[0]['messages'][0]['content']
+                    if block['type'] == 'image']
+    assert len(batch_images) == 3
@@ -1,100 +1,168 @@
 import pytest
 from app.validators.ticket_validator import (
     validate_ticket_data,
-    validate_passenger_name,
-    validate_flight_number,
-    validate_iata_code,
-    validate_flight_dates
+    validate_tickets_data,
+    validate_date_format
 )
 from datetime import datetime, timedelta
+from freezegun import freeze_time
 
-def test_validate_passenger_name():
-    """Test la validation du nom du passager"""
-    assert validate_passenger_name("John Doe")
-    assert validate_passenger_name("Jean-Pierre Dupont")
-    assert validate_passenger_name("María José")
-    
-    assert not validate_passenger_name("John123")
-    assert not validate_passenger_name("John@Doe")
-    assert not validate_passenger_name("")
-    assert not validate_passenger_name(None)
+# Heure figée: rend les tests de dates déterministes et les données partageables
+FROZEN_NOW = datetime(2024, 3, 15, 10, 0, 0)
+
+def _location(iata_code, city, country):
+    return {'iata_code': iata_code, 'city': city, 'country': country, 'terminal': '2E'}
+
+# Billet valide relatif à l'heure figée; chaque test paramétré n'en modifie qu'un champ
+VALID_TICKET = {
+    'passenger_name': 'DOE/John',
+    'flight_number': 'AF123',
+    'departure_date': '2024-04-14',
+    'ticket_number': '057-1234567890',
+    'departure': _location('CDG', 'Paris', 'France'),
+    'arrival': _location('JFK', 'New York', 'USA'),
+}
+
+def _errors(**overrides):
+    """Erreurs de validation du billet valide après modification de certains champs"""
+    return validate_ticket_data({**VALID_TICKET, **overrides}, now=FROZEN_NOW)['errors']
 
-def test_validate_flight_number():
+@pytest.mark.parametrize("name, expected", [
+    ("DOE/John", True),
+    ("DUPONT/Jean", True),
+    ("John Doe", False),
+    ("DOE/JOHN", False),
+    ("DOE123/John", False),
+    ("DOÉ/John", False),
+])
+def test_validate_passenger_name(name, expected):
+    """Test la validation du nom du passager (LASTNAME/Firstname)"""
+    format_error = "Format du nom incorrect (doit être LASTNAME/Firstname)"
+    assert (format_error not in _errors(passenger_name=name)) == expected
+
+@pytest.mark.parametrize("name", ["", None])
+def test_missing_passenger_name(name):
+    """Test le nom du passager absent"""
+    assert "Nom du passager manquant" in _errors(passenger_name=name)
+
+@pytest.mark.parametrize("flight_number, expected", [
+    ("AF123", True),
+    ("BA1", True),
+    ("LH9999", True),
+    ("EZY8001", True),
+    ("123AF", False),
+    ("A123", False),
+    ("AF12345", False),
+])
+def test_validate_flight_number(flight_number, expected):
     """Test la validation du numéro de vol"""
-    assert validate_flight_number("AF123")
-    assert validate_flight_number("BA1")
-    assert validate_flight_number("LH9999")
-    
-    assert not validate_flight_number("123AF")
-    assert not validate_flight_number("A123")
-    assert not validate_flight_number("AF12345")
-    assert not validate_flight_number("")
-    assert not validate_flight_number(None)
-
-def test_validate_iata_code():
-    """Test la validation des codes IATA avec vérification Amadeus"""
-    # Codes IATA valides connus
-    assert validate_iata_code("CDG")  # Paris Charles de Gaulle
-    assert validate_iata_code("JFK")  # New York JFK
-    assert validate_iata_code("LAX")  # Los Angeles
-    
-    # Codes IATA invalides
-    assert not validate_iata_code("CD")
-    assert not validate_iata_code("CDGX")
-    assert not validate_iata_code("123")
-    assert not validate_iata_code("")
-    assert not validate_iata_code(None)
-    assert not validate_iata_code("ZZZ")  # Code inexistant
+    format_error = "Format du numéro de vol incorrect"
+    assert (format_error not in _errors(flight_number=flight_number)) == expected
 
+@pytest.mark.parametrize("iata_code, expected", [
+    ("CDG", True),  # Paris Charles de Gaulle
+    ("JFK", True),  # New York JFK
+    ("ZZZ", True),  # Format valide: l'existence n'est pas vérifiée ici
+    ("CD", False),
+    ("CDGX", False),
+    ("123", False),
+    ("cdg", False),
+])
+def test_validate_iata_code(iata_code, expected):
+    """Test la validation du format des codes IATA"""
+    errors = _errors(departure=_location(iata_code, 'Paris', 'France'))
+    assert ("Format du code IATA de départ incorrect" not in errors) == expected
+
+@pytest.mark.parametrize("date_str, expected", [
+    ("2024-03-15", True),
+    ("2024-3-5", True),
+    ("2024-02-30", False),
+    ("24-01-01", False),
+    ("2024-001-01", False),
+    ("02024-01-01", False),
+    ("2024/03/15", False),
+])
+def test_validate_date_format(date_str, expected):
+    """Test le format de date: mêmes entrées acceptées que strptime('%Y-%m-%d')"""
+    assert validate_date_format(date_str) == expected
+    accepted_by_strptime = True
+    try:
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        accepted_by_strptime = False
+    assert accepted_by_strptime == expected
+
+@freeze_time(FROZEN_NOW)
 def test_validate_flight_dates():
-    """Test la validation des dates de vol"""
-    now = datetime.now()
-    future = now + timedelta(days=1)
-    past = now - timedelta(days=1)
-    
-    # Dates valides
-    valid_departure = future.isoformat()
-    valid_arrival = (future + timedelta(hours=2)).isoformat()
-    assert not validate_flight_dates(valid_departure, valid_arrival)
-    
-    # Date de départ dans le passé
-    assert validate_flight_dates(past.isoformat(), valid_arrival)
-    
-    # Arrivée avant le départ
-    invalid_arrival = (future - timedelta(hours=1)).isoformat()
-    assert validate_flight_dates(valid_departure, invalid_arrival)
-    
-    # Vol trop long
-    long_flight = (future + timedelta(hours=25)).isoformat()
-    assert validate_flight_dates(valid_departure, long_flight)
-
-def test_validate_ticket_data():
-    """Test la validation complète des données du billet avec Amadeus"""
-    # Données de vol valides (utiliser des vols réels)
-    valid_ticket_data = {
-        'passenger_name': 'John Doe',
-        'flight_number': 'AF123',  # Un vol Air France réel
-        'departure_airport': 'CDG',  # Paris
-        'arrival_airport': 'JFK',    # New York
-        'departure_time': (datetime.now() + timedelta(days=30)).isoformat(),
-        'arrival_time': (datetime.now() + timedelta(days=30, hours=8)).isoformat()
+    """Test la validation de la date de départ par rapport à l'heure courante (figée)"""
+    past_error = "La date de départ est dans le passé"
+    tomorrow = (FROZEN_NOW + timedelta(days=1)).date().isoformat()
+    yesterday = (FROZEN_NOW - timedelta(days=1)).date().isoformat()
+
+    # Sans paramètre now, la validation lit l'heure figée
+    assert validate_ticket_data({**VALID_TICKET, 'departure_date': tomorrow})['is_valid']
+
+    errors = validate_ticket_data({**VALID_TICKET, 'departure_date': yesterday})['errors']
+    assert errors == [past_error]
+
+    # Minuit du jour courant est déjà passé à 10h
+    errors = validate_ticket_data({**VALID_TICKET, 'departure_date': FROZEN_NOW.date().isoformat()})['errors']
+    assert errors == [past_error]
+
+    errors = validate_ticket_data({**VALID_TICKET, 'departure_date': '2024-02-30'})['errors']
+    assert errors == ["Format de date incorrect (doit être YYYY-MM-DD)"]
+
+@pytest.fixture(scope="module")
+def valid_ticket_data():
+    """Données de vol valides, relatives à l'heure figée"""
+    return {
+        **VALID_TICKET,
+        'departure_date': (FROZEN_NOW + timedelta(days=30)).date().isoformat()
     }
-    
+
+@pytest.fixture(scope="module")
+def invalid_ticket_data():
+    """Données de vol invalides, relatives à l'heure figée"""
+    return {
+        'passenger_name': 'John123',  # Nom invalide
+        'flight_number': 'XX99999',   # Numéro de vol invalide
+        'departure_date': (FROZEN_NOW - timedelta(days=1)).date().isoformat(),  # Date dans le passé
+        'ticket_number': '12345',     # Numéro de billet invalide
+        'departure': _location('ZZZZ', 'Paris', 'France'),  # Code IATA invalide
+        'arrival': {}                 # Arrivée manquante
+    }
+
+@freeze_time(FROZEN_NOW)
+def test_validate_ticket_data(valid_ticket_data, invalid_ticket_data):
+    """Test la validation complète des données du billet"""
     # Valider le billet
     result = validate_ticket_data(valid_ticket_data)
     assert result['is_valid'], f"Validation failed with errors: {result['errors']}"
     
-    # Données de vol invalides
-    invalid_ticket_data = {
-        'passenger_name': 'John123',  # Nom invalide
-        'flight_number': 'XX999',     # Numéro de vol invalide
-        'departure_airport': 'ZZZ',   # Code IATA invalide
-        'arrival_airport': 'YYY',     # Code IATA invalide
-        'departure_time': datetime.now().isoformat(),  # Date dans le passé
-        'arrival_time': (datetime.now() + timedelta(hours=1)).isoformat()
-    }
-    
-    # Valider le billet invalide
+    # Valider le billet invalide: une erreur par champ fautif, dans l'ordre des règles
     result = validate_ticket_data(invalid_ticket_data)
     assert not result['is_valid']
-    assert len(result['errors']) > 0
+    assert result['errors'] == [
+        "Format du nom incorrect (doit être LASTNAME/Firstname)",
+        "Format du numéro de vol incorrect",
+        "La date de départ est dans le passé",
+        "Format du numéro de billet incorrect",
+        "Format du code IATA de départ incorrect",
+        "Informations d'arrivée manquantes",
+    ]
+
+@freeze_time(FROZEN_NOW)
+def test_validate_tickets_data(valid_ticket_data, invalid_ticket_data):
+    """Test la validation par lot: un résultat par billet, dans l'ordre, sans interférence"""
+    tickets = [
+        valid_ticket_data,
+        invalid_ticket_data,
+        {**valid_ticket_data, 'flight_number': '123AF'},
+        valid_ticket_data,
+    ]
+
+    results = validate_tickets_data(tickets)
+
+    assert [result['is_valid'] for result in results] == [True, False, False, True]
+    assert results == [validate_ticket_data(ticket_data) for ticket_data in tickets]
+    assert results[2]['errors'] == ["Format du numéro de vol incorrect"]